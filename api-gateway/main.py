@@ -1,17 +1,29 @@
 import datetime
+import json
 import os
-from typing import Callable
+from typing import Callable, List
 
 import httpx
 import jwt
 from fastapi import Depends, FastAPI, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+
+from shared.observability import install_observability
+from shared.rate_limit import RATE_LIMIT_ENABLED, RateLimiter, create_store, policies_from_env
+from shared.service_client import service_client
 
 JWT_SECRET = os.getenv("JWT_SECRET", "super-secret-key")
 LIMITS_SERVICE_URL = os.getenv("LIMITS_SERVICE_URL", "http://localhost:8003")
+ASSISTANT_SERVICE_URL = os.getenv("ASSISTANT_SERVICE_URL", "http://localhost:8004")
 
 app = FastAPI(title="API Gateway", version="0.1.0")
 
+# Keyed by the JWT `sub`, tiered by its optional `plan` claim (free when absent)
+rate_limiter = RateLimiter(create_store(), policies_from_env()) if RATE_LIMIT_ENABLED else None
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -25,27 +37,45 @@ app.add_middleware(
 @app.middleware("http")
 async def auth_middleware(request: Request, call_next: Callable):
     # Allow unauthenticated access to landing resources
-    if request.url.path.startswith("/public") or request.url.path in {"/health"}:
+    if request.url.path.startswith("/public") or request.url.path in {"/health", "/metrics"}:
         return await call_next(request)
 
+    # Exceptions raised in a middleware bypass FastAPI's handlers, so errors are returned directly
     authorization: str = request.headers.get("authorization")
     if not authorization or not authorization.lower().startswith("bearer "):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing bearer token")
+        return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"detail": "Missing bearer token"})
 
     token = authorization.split(" ", 1)[1]
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-    except jwt.ExpiredSignatureError as exc:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expired") from exc
-    except jwt.InvalidTokenError as exc:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token") from exc
+    except jwt.ExpiredSignatureError:
+        return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"detail": "Token expired"})
+    except jwt.InvalidTokenError:
+        return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"detail": "Invalid token"})
+
+    rate_limit_headers = {}
+    if rate_limiter is not None:
+        decision = await rate_limiter.check(str(payload.get("sub")), payload.get("plan"))
+        rate_limit_headers = decision.headers()
+        if not decision.allowed:
+            return JSONResponse(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                content={"detail": "Rate limit exceeded"},
+                headers=rate_limit_headers,
+            )
 
     request.state.user_id = payload.get("sub")
+    request.state.plan = payload.get("plan") or "Free"
     response = await call_next(request)
     response.headers["X-User-ID"] = str(payload.get("sub"))
+    response.headers.update(rate_limit_headers)
     return response
 
 
+# Registered last so it wraps the auth middleware and also times rejected requests
+install_observability(app, "api-gateway")
+
+
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
@@ -68,8 +98,8 @@ def dashboard(request: Request):
 
     try:
         current_year = datetime.datetime.utcnow().year
-        response = httpx.get(
-            f"{LIMITS_SERVICE_URL}/limits/summary",
+        response = service_client("limits", LIMITS_SERVICE_URL).get(
+            "/limits/summary",
             params={"year": current_year, "user_id": user_id},
             timeout=5,
         )
@@ -80,25 +110,93 @@ def dashboard(request: Request):
         revenue_year = summary.get("revenue_year", 0.0)
         limit_remaining = summary.get("limit_remaining", 0.0)
 
+        alerts = [f"Limite restante MEI: R$ {limit_remaining:,.2f}"]
+        alerts.extend(forecast_alerts(user_id))
+        alerts.append("Envie novas notas fiscais para manter a atualização em tempo real.")
+
         return {
             "user_id": user_id,
             "revenue_month": revenue_month,
             "revenue_year": revenue_year,
             "tax_due": round(revenue_month * 0.08, 2),
             "documents_pending": 0,
-            "alerts": [
-                f"Limite restante MEI: R$ {limit_remaining:,.2f}",
-                "Envie novas notas fiscais para manter a atualização em tempo real.",
-            ],
+            "alerts": alerts,
         }
     except httpx.HTTPError:
         return fallback
 
 
+def forecast_alerts(user_id: str) -> List[str]:
+    # The forecast only enriches the dashboard: if limits cannot answer, the summary still goes out
+    try:
+        response = service_client("limits", LIMITS_SERVICE_URL).get(
+            "/limits/forecast",
+            params={"user_id": user_id},
+            timeout=5,
+        )
+        response.raise_for_status()
+        forecast = response.json()
+    except httpx.HTTPError:
+        return []
+
+    if forecast.get("breach_label"):
+        return [
+            f"No ritmo atual você ultrapassa o limite do MEI em {forecast['breach_label']} "
+            f"(projeção anual: R$ {forecast['projected_revenue_year']:,.2f})."
+        ]
+    if forecast.get("projected_revenue_year"):
+        return [
+            f"Projeção anual: R$ {forecast['projected_revenue_year']:,.2f}; "
+            f"folga estimada de R$ {forecast['projected_limit_remaining']:,.2f} no limite do MEI."
+        ]
+    return []
+
+
+@app.api_route("/assistant/{path:path}", methods=["GET", "POST"])
+async def assistant_proxy(path: str, request: Request):
+    # Forwarded after the auth middleware, so chat traffic spends the caller's rate limit tokens
+    body = await request.body()
+    if body:
+        # The assistant trusts `user_id`: pin it to the token's subject so nobody reads or bills
+        # another user's data. Unparseable bodies go through as-is and fail validation upstream.
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            payload = None
+        if isinstance(payload, dict):
+            try:
+                payload["user_id"] = int(request.state.user_id)
+            except (TypeError, ValueError):
+                return JSONResponse(status_code=status.HTTP_403_FORBIDDEN, content={"detail": "Invalid token subject"})
+            body = json.dumps(payload).encode()
+
+    client = service_client("assistant", ASSISTANT_SERVICE_URL)
+    upstream = client.build_request(
+        request.method,
+        f"/assistant/{path}",
+        params=request.query_params.multi_items(),
+        content=body,
+        headers={"content-type": request.headers.get("content-type", "application/json")},
+        timeout=60,
+    )
+    try:
+        response = await run_in_threadpool(client.send, upstream, stream=True)
+    except httpx.HTTPError:
+        return JSONResponse(status_code=status.HTTP_502_BAD_GATEWAY, content={"detail": "Assistant unavailable"})
+
+    # Streamed through so /assistant/chat/stream frames reach the client as they are produced
+    return StreamingResponse(
+        response.iter_bytes(),
+        status_code=response.status_code,
+        media_type=response.headers.get("content-type"),
+        background=BackgroundTask(response.close),
+    )
+
+
 @app.get("/profile")
 def profile(request: Request):
     user_id = getattr(request.state, "user_id", None)
     if not user_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
 
-    return {"user_id": user_id, "plan": "Pro"}
+    return {"user_id": user_id, "plan": request.state.plan}
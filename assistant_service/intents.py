@@ -0,0 +1,165 @@
+import datetime
+import re
+from typing import NamedTuple, Optional, Tuple
+
+from .retrieval import normalize_text
+
+MONTH_NAMES = [
+    "janeiro", "fevereiro", "marco", "abril", "maio", "junho",
+    "julho", "agosto", "setembro", "outubro", "novembro", "dezembro",
+]
+MONTH_LABELS = [
+    "janeiro", "fevereiro", "março", "abril", "maio", "junho",
+    "julho", "agosto", "setembro", "outubro", "novembro", "dezembro",
+]
+
+REVENUE_PATTERN = re.compile(r"\b(fatur\w*|receb\w*|ganhei|ganho|vendi|vendas|receita|entrou|entradas?)\b")
+LIMIT_PATTERN = re.compile(
+    r"\b(falta\w*|resta\w*|sobra\w*|ainda posso|posso faturar|disponivel|ultrapass\w*|estour\w*)\b"
+    r".*\b(limite|teto|mei|81)\b"
+    r"|\blimite\b.*\b(mei|restante|disponivel|anual)\b"
+)
+TAX_PATTERN = re.compile(r"\b(impostos?|tributos?|guia do das|boleto do das)\b")
+# "das" is also a contraction ("das notas"), so the DAS guide only counts when written in caps
+DAS_PATTERN = re.compile(r"\bDAS\b")
+DOCUMENT_PATTERN = re.compile(r"\bquant(os|as) (documentos?|notas?|nfs?|nf-?e|arquivos?|uploads?)\b")
+QUESTION_PATTERN = re.compile(r"\b(quanto|quantos|quantas|qual|quais|valor|total|estim\w*|previs\w*)\b")
+
+LAST_MONTHS_PATTERN = re.compile(r"\bultimos? (\d{1,2}) mes(es)?\b")
+NAMED_MONTH_PATTERN = re.compile(r"\b(" + "|".join(MONTH_NAMES) + r")\b(?: (?:de )?(\d{4}))?")
+YEAR_PATTERN = re.compile(r"\b(?:em|de|no ano de|ano) (\d{4})\b")
+# Typed years outside this window ("janeiro de 0000") are left to the RAG path
+SUPPORTED_YEARS = range(2000, 2100)
+
+# A preposition followed by anything other than a period or fiscal term ("da padaria", "na loja",
+# "em Sao Paulo", "pela empresa X") scopes the question to an entity, which aggregates alone cannot answer
+SCOPE_PATTERN = re.compile(
+    r"\b(?:da|do|dos|das|de|na|no|nas|nos|em|pela|pelo|pelas|pelos|com|para|pra|pro|cliente)"
+    r"\s+(?:o |a |os |as )?(\w+)"
+)
+SCOPE_ALLOWED = {
+    "mes", "meses", "ano", "anos", "limite", "mei", "das", "imposto", "impostos", "meu", "minha",
+    "meus", "minhas", "ultimo", "ultimos", "ultima", "passado", "atual", "este", "esse", "faturamento",
+    "receita", "periodo", "nota", "notas", "documento", "documentos", "pagar", "total", "reais", "que",
+    "guia", "atingir", "chegar", "bater", "estourar", "ultrapassar", *MONTH_NAMES,
+}
+# Conditionals and future tense ("se faturar 10 mil", "quanto vou faturar no ano que vem") ask for a
+# projection, not for what the aggregates already hold
+HYPOTHETICAL_PATTERN = re.compile(
+    r"\b(se|caso|vou|vai|vamos|irei|ira|iremos|que vem|proxim\w*|futur\w*|daqui a)\b"
+)
+# Limit questions must ask for a figure; "o que acontece se eu estourar o limite?" goes to RAG
+LIMIT_QUESTION_PATTERN = re.compile(r"\b(quanto|quanta|qual)\b")
+
+
+class IntentMatch(NamedTuple):
+    intent: str
+    start: datetime.date
+    end: datetime.date
+    label: str
+
+
+def _month_bounds(year: int, month: int) -> Tuple[datetime.date, datetime.date]:
+    start = datetime.date(year, month, 1)
+    end = (start.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+    return start, end
+
+
+def _typed_year(value: str) -> int:
+    year = int(value)
+    if year not in SUPPORTED_YEARS:
+        raise ValueError(f"Unsupported year: {year}")
+    return year
+
+
+def resolve_period(text: str, today: datetime.date) -> Optional[Tuple[datetime.date, datetime.date, str]]:
+    """
+    Turns phrases like "mês passado" or "março de 2024" into a [start, end) range plus a label.
+    Raises ValueError for a typed year outside SUPPORTED_YEARS.
+    """
+    if re.search(r"\b(mes passado|ultimo mes|mes anterior)\b", text):
+        previous = today.replace(day=1) - datetime.timedelta(days=1)
+        start, end = _month_bounds(previous.year, previous.month)
+        return start, end, f"em {MONTH_LABELS[start.month - 1]} de {start.year}"
+
+    if re.search(r"\b(este|esse|neste|nesse|deste|desse) mes\b|\bmes atual\b", text):
+        start, end = _month_bounds(today.year, today.month)
+        return start, end, "neste mês"
+
+    last_months = LAST_MONTHS_PATTERN.search(text)
+    if last_months:
+        months = max(1, int(last_months.group(1)))
+        start = today.replace(day=1)
+        for _ in range(months - 1):
+            start = (start - datetime.timedelta(days=1)).replace(day=1)
+        return start, _month_bounds(today.year, today.month)[1], f"nos últimos {months} meses"
+
+    named_month = NAMED_MONTH_PATTERN.search(text)
+    if named_month:
+        month = MONTH_NAMES.index(named_month.group(1)) + 1
+        if named_month.group(2):
+            year = _typed_year(named_month.group(2))
+        else:
+            # A bare month name means its latest occurrence: "dezembro" asked in October is last December
+            year = today.year if month <= today.month else today.year - 1
+        start, end = _month_bounds(year, month)
+        return start, end, f"em {MONTH_LABELS[month - 1]} de {year}"
+
+    if re.search(r"\b(ano passado|ultimo ano|ano anterior)\b", text):
+        year = today.year - 1
+        return datetime.date(year, 1, 1), datetime.date(year + 1, 1, 1), f"em {year}"
+
+    explicit_year = YEAR_PATTERN.search(text)
+    if explicit_year:
+        year = _typed_year(explicit_year.group(1))
+        return datetime.date(year, 1, 1), datetime.date(year + 1, 1, 1), f"em {year}"
+
+    if re.search(r"\b(este|esse|neste|nesse|deste|desse) ano\b|\bano atual\b|\bno ano\b", text):
+        return datetime.date(today.year, 1, 1), datetime.date(today.year + 1, 1, 1), f"em {today.year}"
+
+    return None
+
+
+def match_intent(message: str, today: Optional[datetime.date] = None) -> Optional[IntentMatch]:
+    """
+    Recognises the handful of fiscal questions that can be answered from aggregates alone.
+    Returns None for anything else so the caller falls back to the RAG path.
+    """
+    today = today or datetime.date.today()
+    text = re.sub(r"\s+", " ", normalize_text(message)).strip()
+
+    if HYPOTHETICAL_PATTERN.search(text):
+        return None
+
+    for scope in SCOPE_PATTERN.finditer(text):
+        if scope.group(1) not in SCOPE_ALLOWED and not scope.group(1).isdigit():
+            return None
+
+    try:
+        period = resolve_period(text, today)
+    except ValueError:
+        return None
+
+    if LIMIT_PATTERN.search(text):
+        if not LIMIT_QUESTION_PATTERN.search(text):
+            return None
+        # The MEI limit is annual, so any period mentioned only selects the year
+        year = period[0].year if period else today.year
+        return IntentMatch("limit_remaining", datetime.date(year, 1, 1), datetime.date(year + 1, 1, 1), f"em {year}")
+
+    if not QUESTION_PATTERN.search(text):
+        return None
+
+    if TAX_PATTERN.search(text) or DAS_PATTERN.search(message):
+        start, end, label = period or (*_month_bounds(today.year, today.month), "neste mês")
+        return IntentMatch("tax_estimate", start, end, label)
+
+    if DOCUMENT_PATTERN.search(text):
+        start, end, label = period or (datetime.date.min, datetime.date.max, "no total")
+        return IntentMatch("document_count", start, end, label)
+
+    if REVENUE_PATTERN.search(text) and period:
+        start, end, label = period
+        return IntentMatch("revenue_period", start, end, label)
+
+    return None
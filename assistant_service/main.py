@@ -1,36 +1,30 @@
 import datetime
+import json
 import os
-from typing import Dict, List, Optional
+import threading
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 import httpx
 from fastapi import Depends, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from sqlalchemy import Column, Date, DateTime, Float, Integer, String, create_engine
-from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from sqlalchemy import func
+from sqlalchemy.orm import Session
 
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./saas.db")
-BILLING_SERVICE_URL = os.getenv("BILLING_SERVICE_URL", "http://localhost:8005")
-DEFAULT_MONTH_WINDOW = int(os.getenv("ASSISTANT_MONTH_WINDOW", "3"))
-
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {},
-)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
-Base = declarative_base()
+from shared.database import get_read_db, init_db
+from shared.models import Document, Transaction
+from shared.observability import install_observability
+from shared.service_client import service_client
 
+from .intents import IntentMatch, match_intent
+from .retrieval import UserVectorIndex, VectorStore
 
-class Transaction(Base):
-    __tablename__ = "transactions"
-
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, index=True, nullable=False)
-    document_id = Column(Integer, index=True)
-    amount = Column(Float, nullable=False)
-    transaction_date = Column(Date, nullable=False)
-    description = Column(String)
-    created_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+BILLING_SERVICE_URL = os.getenv("BILLING_SERVICE_URL", "http://localhost:8005")
+DEFAULT_MONTH_WINDOW = int(os.getenv("ASSISTANT_MONTH_WINDOW", "3"))
+RETRIEVAL_TOP_K = int(os.getenv("ASSISTANT_RETRIEVAL_TOP_K", "5"))
+TAX_RATE = float(os.getenv("ASSISTANT_TAX_RATE", "0.08"))
+MEI_ANNUAL_LIMIT = 81000.0
 
 
 class ChatRequest(BaseModel):
@@ -50,6 +44,11 @@ class ChatResponse(BaseModel):
     transactions_context: Dict[str, object]
 
 
+vector_store = VectorStore()
+
+router_stats: Dict[str, object] = {"fast_path": 0, "fallthrough": 0, "intents": {}}
+router_stats_lock = threading.Lock()
+
 app = FastAPI(title="Assistant Service", version="0.1.0")
 
 app.add_middleware(
@@ -60,9 +59,7 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-
-def init_db():
-    Base.metadata.create_all(bind=engine)
+install_observability(app, "assistant")
 
 
 @app.on_event("startup")
@@ -70,14 +67,6 @@ def startup_event():
     init_db()
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 def build_transactions_context(transactions: List[Transaction]) -> Dict[str, object]:
     total_amount = sum(t.amount for t in transactions)
     monthly_totals: Dict[str, float] = {}
@@ -103,6 +92,159 @@ def build_transactions_context(transactions: List[Transaction]) -> Dict[str, obj
     }
 
 
+def _transaction_item(tx: Transaction) -> Tuple[Tuple[str, int], str, Dict[str, object]]:
+    return (
+        ("transaction", tx.id),
+        f"{tx.description or ''} {tx.transaction_date:%m/%Y}",
+        {
+            "kind": "transaction",
+            "id": tx.id,
+            "date": tx.transaction_date.isoformat(),
+            "amount": tx.amount,
+            "description": tx.description,
+        },
+    )
+
+
+def _document_item(doc: Document) -> Tuple[Tuple[str, int], str, Dict[str, object]]:
+    return (
+        ("document", doc.id),
+        f"{doc.filename} {doc.description or ''}",
+        {
+            "kind": "document",
+            "id": doc.id,
+            "date": doc.transaction_date.isoformat() if doc.transaction_date else None,
+            "amount": doc.total_value,
+            "description": doc.description or doc.filename,
+        },
+    )
+
+
+def refresh_user_index(db: Session, user_id: int) -> UserVectorIndex:
+    """
+    Embeds the transactions and document extractions that landed or changed since the last sync.
+    A processed document is indexed through the transaction derived from it, so each record appears
+    once; re-processing a document bumps `processed_at` and re-embeds that transaction in place.
+    """
+    index = vector_store.index_for(user_id)
+    with index.lock:
+        items: Dict[Tuple[str, int], Tuple[Tuple[str, int], str, Dict[str, object]]] = {}
+
+        new_transactions = (
+            db.query(Transaction)
+            .filter(Transaction.user_id == user_id, Transaction.id > index.last_transaction_id)
+            .order_by(Transaction.id)
+            .all()
+        )
+        for tx in new_transactions:
+            item = _transaction_item(tx)
+            items[item[0]] = item
+
+        documents_query = (
+            db.query(Document, Transaction)
+            .outerjoin(Transaction, Transaction.document_id == Document.id)
+            .filter(
+                Document.user_id == user_id,
+                Document.status == "completed",
+                Document.processed_at.isnot(None),
+            )
+        )
+        if index.last_document_processed_at is not None:
+            documents_query = documents_query.filter(Document.processed_at > index.last_document_processed_at)
+        processed = documents_query.order_by(Document.processed_at).all()
+        for doc, tx in processed:
+            item = _transaction_item(tx) if tx is not None else _document_item(doc)
+            items[item[0]] = item
+
+        vector_store.upsert_texts(user_id, items.values(), index=index)
+        if new_transactions:
+            index.last_transaction_id = new_transactions[-1].id
+        if processed:
+            index.last_document_processed_at = processed[-1][0].processed_at
+    return index
+
+
+def retrieve_relevant_records(
+    db: Session, user_id: int, message: str, k: int = RETRIEVAL_TOP_K
+) -> List[Dict[str, object]]:
+    index = refresh_user_index(db, user_id)
+    return [
+        dict(payload, score=round(score, 4))
+        for _, score, payload in index.search(vector_store.embedder.embed(message), k=k)
+        if score > 0
+    ]
+
+
+def record_route(intent: Optional[str]) -> None:
+    with router_stats_lock:
+        if intent is None:
+            router_stats["fallthrough"] += 1
+        else:
+            router_stats["fast_path"] += 1
+            router_stats["intents"][intent] = router_stats["intents"].get(intent, 0) + 1
+
+
+def sum_revenue(db: Session, user_id: int, start: datetime.date, end: datetime.date) -> Dict[str, object]:
+    total_amount, total_count = (
+        db.query(func.coalesce(func.sum(Transaction.amount), 0), func.count(Transaction.id))
+        .filter(
+            Transaction.user_id == user_id,
+            Transaction.transaction_date >= start,
+            Transaction.transaction_date < end,
+        )
+        .one()
+    )
+    return {"total_amount": round(float(total_amount), 2), "total_count": int(total_count)}
+
+
+def answer_intent(db: Session, user_id: int, match: IntentMatch) -> Tuple[str, Dict[str, object]]:
+    """Answers a recognised question straight from aggregate queries, without building RAG context."""
+    context_summary: Dict[str, object] = {
+        "intent": match.intent,
+        "period_start": match.start.isoformat(),
+        "period_end": match.end.isoformat(),
+    }
+
+    if match.intent == "document_count":
+        query = db.query(Document.status, func.count(Document.id)).filter(Document.user_id == user_id)
+        if match.start != datetime.date.min:
+            query = query.filter(
+                Document.uploaded_at >= datetime.datetime.combine(match.start, datetime.time.min),
+                Document.uploaded_at < datetime.datetime.combine(match.end, datetime.time.min),
+            )
+        by_status = {status: int(count) for status, count in query.group_by(Document.status).all()}
+        total = sum(by_status.values())
+        pending = by_status.get("pending", 0) + by_status.get("processing", 0)
+        context_summary.update({"documents_total": total, "documents_by_status": by_status})
+        reply = f"Você enviou {total} documento(s) {match.label}, dos quais {pending} ainda em processamento."
+        return reply, context_summary
+
+    revenue = sum_revenue(db, user_id, match.start, match.end)
+    context_summary.update(revenue)
+
+    if match.intent == "limit_remaining":
+        remaining = max(0.0, MEI_ANNUAL_LIMIT - revenue["total_amount"])
+        context_summary["limit_remaining"] = round(remaining, 2)
+        reply = (
+            f"Seu faturamento {match.label} soma R$ {revenue['total_amount']:.2f}. "
+            f"Faltam R$ {remaining:.2f} para atingir o limite anual do MEI (R$ {MEI_ANNUAL_LIMIT:.2f})."
+        )
+    elif match.intent == "tax_estimate":
+        tax_due = round(revenue["total_amount"] * TAX_RATE, 2)
+        context_summary["tax_due"] = tax_due
+        reply = (
+            f"Com faturamento de R$ {revenue['total_amount']:.2f} {match.label}, "
+            f"o imposto estimado é de R$ {tax_due:.2f} ({TAX_RATE:.0%} da receita)."
+        )
+    else:
+        reply = (
+            f"Seu faturamento {match.label} foi de R$ {revenue['total_amount']:.2f} "
+            f"em {revenue['total_count']} transação(ões)."
+        )
+
+    return reply, context_summary
+
+
 def draft_assistant_reply(message: str, context_summary: Dict[str, object]) -> str:
     lines = [
         "Usei suas transações recentes para responder:",
@@ -116,6 +258,12 @@ def draft_assistant_reply(message: str, context_summary: Dict[str, object]) -> s
         )
         lines.append(f"- Distribuição mensal: {monthly_lines}")
 
+    if context_summary.get("retrieved"):
+        lines.append("- Registros mais relacionados à pergunta:")
+        for record in context_summary["retrieved"]:
+            amount = f"R$ {record['amount']:.2f}" if record.get("amount") is not None else "valor não extraído"
+            lines.append(f"  • {record.get('date') or 's/ data'} | {amount} | {record.get('description')}")
+
     lines.append("\nResposta:")
     lines.append(
         """Recebi sua mensagem e montei um parecer breve com base no histórico. "
@@ -126,6 +274,23 @@ def draft_assistant_reply(message: str, context_summary: Dict[str, object]) -> s
     return "\n".join(lines)
 
 
+ReplyGenerator = Callable[[str, Dict[str, object]], Iterator[str]]
+
+
+def stub_reply_generator(message: str, context_summary: Dict[str, object]) -> Iterator[str]:
+    """
+    Local stand-in for an LLM: yields the drafted reply line by line, the same way a real model
+    would emit chunks while generating.
+    """
+    for line in draft_assistant_reply(message, context_summary).splitlines(keepends=True):
+        yield line
+
+
+def get_reply_generator() -> ReplyGenerator:
+    # Override via app.dependency_overrides to plug in a real LLM client or a test double
+    return stub_reply_generator
+
+
 def estimate_token_usage(content: str) -> int:
     return max(1, len(content.split()))
 
@@ -133,14 +298,17 @@ def estimate_token_usage(content: str) -> int:
 def track_usage(user_id: int, tokens_used: int) -> None:
     payload = {"user_id": user_id, "tokens_used": tokens_used, "api_calls": 1}
     try:
-        response = httpx.post(f"{BILLING_SERVICE_URL}/billing/track-usage", json=payload, timeout=5)
+        response = service_client("billing", BILLING_SERVICE_URL).post(
+            "/billing/track-usage",
+            json=payload,
+            timeout=5,
+        )
         response.raise_for_status()
     except httpx.HTTPError as exc:
         raise HTTPException(status_code=502, detail=f"Erro ao registrar uso: {exc}") from exc
 
 
-@app.post("/assistant/chat", response_model=ChatResponse)
-def chat(request: ChatRequest, db: Session = Depends(get_db)):
+def load_transactions_context(db: Session, request: ChatRequest) -> Dict[str, object]:
     month_cutoff = datetime.date.today().replace(day=1) - datetime.timedelta(days=30 * (request.months - 1))
     transactions = (
         db.query(Transaction)
@@ -150,8 +318,23 @@ def chat(request: ChatRequest, db: Session = Depends(get_db)):
     )
 
     context_summary = build_transactions_context(transactions)
+    context_summary["retrieved"] = retrieve_relevant_records(db, request.user_id, request.message)
     if request.context:
         context_summary["extra_context"] = request.context
+    return context_summary
+
+
+@app.post("/assistant/chat", response_model=ChatResponse)
+def chat(request: ChatRequest, db: Session = Depends(get_read_db)):
+    match = match_intent(request.message)
+    record_route(match.intent if match else None)
+
+    if match:
+        reply, context_summary = answer_intent(db, request.user_id, match)
+        track_usage(user_id=request.user_id, tokens_used=0)
+        return ChatResponse(reply=reply, tokens_used=0, transactions_context=context_summary)
+
+    context_summary = load_transactions_context(db, request)
 
     reply = draft_assistant_reply(request.message, context_summary)
     tokens_used = estimate_token_usage(reply)
@@ -163,3 +346,64 @@ def chat(request: ChatRequest, db: Session = Depends(get_db)):
         tokens_used=tokens_used,
         transactions_context=context_summary,
     )
+
+
+def stream_chat_frames(
+    user_id: int,
+    chunks: Iterable[str],
+    context_summary: Dict[str, object],
+    count_tokens: bool = True,
+) -> Iterator[str]:
+    generated: List[str] = []
+    for chunk in chunks:
+        generated.append(chunk)
+        yield json.dumps({"type": "delta", "content": chunk}, ensure_ascii=False) + "\n"
+
+    tokens_used = estimate_token_usage("".join(generated)) if count_tokens else 0
+    try:
+        track_usage(user_id=user_id, tokens_used=tokens_used)
+    except HTTPException as exc:
+        # Headers are already sent, so billing failures are reported in-band
+        yield json.dumps({"type": "error", "detail": exc.detail}, ensure_ascii=False) + "\n"
+        return
+
+    yield json.dumps(
+        {"type": "done", "tokens_used": tokens_used, "transactions_context": context_summary},
+        ensure_ascii=False,
+    ) + "\n"
+
+
+@app.post("/assistant/chat/stream")
+def chat_stream(
+    request: ChatRequest,
+    db: Session = Depends(get_read_db),
+    generator: ReplyGenerator = Depends(get_reply_generator),
+):
+    match = match_intent(request.message)
+    record_route(match.intent if match else None)
+
+    # Context is built before streaming starts so the DB session is not held during generation
+    if match:
+        reply, context_summary = answer_intent(db, request.user_id, match)
+        frames = stream_chat_frames(request.user_id, [reply], context_summary, count_tokens=False)
+    else:
+        context_summary = load_transactions_context(db, request)
+        frames = stream_chat_frames(request.user_id, generator(request.message, context_summary), context_summary)
+
+    return StreamingResponse(frames, media_type="application/x-ndjson")
+
+
+@app.get("/assistant/router/stats")
+def router_statistics():
+    with router_stats_lock:
+        fast_path = router_stats["fast_path"]
+        fallthrough = router_stats["fallthrough"]
+        intents = dict(router_stats["intents"])
+
+    total = fast_path + fallthrough
+    return {
+        "fast_path": fast_path,
+        "fallthrough": fallthrough,
+        "fast_path_share": round(fast_path / total, 4) if total else 0.0,
+        "intents": intents,
+    }
@@ -0,0 +1,242 @@
+import os
+import re
+import threading
+import unicodedata
+import zlib
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+EMBEDDING_DIM = int(os.getenv("ASSISTANT_EMBEDDING_DIM", "256"))
+# Rows of EMBEDDING_DIM float32 kept across all users (256 MB at the defaults)
+INDEX_MAX_VECTORS = int(os.getenv("ASSISTANT_INDEX_MAX_VECTORS", "262144"))
+INDEX_MAX_USERS = int(os.getenv("ASSISTANT_INDEX_MAX_USERS", "10000"))
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def normalize_text(text: str) -> str:
+    """Lowercases and strips accents so "Serviço" and "servico" hash to the same features."""
+    text = text.lower()
+    if text.isascii():
+        return text
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+@lru_cache(maxsize=262144)
+def _hash_feature(feature: str, dim: int) -> Tuple[int, float]:
+    hashed = zlib.crc32(feature.encode("utf-8"))
+    return (hashed >> 1) % dim, 1.0 if hashed & 1 else -1.0
+
+
+@lru_cache(maxsize=131072)
+def _token_features(token: str, dim: int, char_ngram: int, char_weight: float) -> Tuple[Tuple[int, float], ...]:
+    bucket, sign = _hash_feature(token, dim)
+    features = [(bucket, sign)]
+    padded = f"#{token}#"
+    for start in range(len(padded) - char_ngram + 1):
+        bucket, sign = _hash_feature("c:" + padded[start : start + char_ngram], dim)
+        features.append((bucket, sign * char_weight))
+    return tuple(features)
+
+
+class HashingEmbedder:
+    """
+    Stateless feature-hashing embedder. Words, word bigrams and character trigrams are hashed
+    into a fixed number of signed buckets and the result is L2 normalised, so vectors can be
+    produced offline and compared across processes without a fitted vocabulary.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM, char_ngram: int = 3, char_weight: float = 0.5):
+        self.dim = dim
+        self.char_ngram = char_ngram
+        self.char_weight = char_weight
+
+    def sparse_features(self, text: str) -> List[Tuple[int, float]]:
+        tokens = TOKEN_PATTERN.findall(normalize_text(text))
+        features: List[Tuple[int, float]] = []
+        for token in tokens:
+            features.extend(_token_features(token, self.dim, self.char_ngram, self.char_weight))
+        for left, right in zip(tokens, tokens[1:]):
+            features.append(_hash_feature(f"b:{left}_{right}", self.dim))
+        return features
+
+    def embed(self, text: str) -> np.ndarray:
+        return self.embed_many([text])[0]
+
+    def embed_many(self, texts: Sequence[str]) -> np.ndarray:
+        # One bincount over flattened (row * dim + bucket) offsets instead of per-feature writes
+        offsets: List[int] = []
+        values: List[float] = []
+        for row, text in enumerate(texts):
+            base = row * self.dim
+            for bucket, value in self.sparse_features(text):
+                offsets.append(base + bucket)
+                values.append(value)
+
+        matrix = np.bincount(
+            np.asarray(offsets, dtype=np.int64),
+            weights=np.asarray(values, dtype=np.float64),
+            minlength=len(texts) * self.dim,
+        ).astype(np.float32).reshape(len(texts), self.dim)
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+
+class UserVectorIndex:
+    """
+    Dense matrix of unit vectors for a single user. Rows are addressed by a hashable key such as
+    ("transaction", 42) so re-indexing an updated record overwrites it in place. The matrix is
+    allocated on the first insert, so a user with nothing indexed holds no vector memory.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM, initial_capacity: int = 64):
+        self.dim = dim
+        self.lock = threading.RLock()
+        self.last_transaction_id = 0
+        self.last_document_processed_at = None
+        self.initial_capacity = initial_capacity
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+        self._keys: List[Hashable] = []
+        self._payloads: List[Dict[str, object]] = []
+        self._positions: Dict[Hashable, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @property
+    def capacity(self) -> int:
+        return self._vectors.shape[0]
+
+    def _reserve(self, extra: int) -> None:
+        required = len(self._keys) + extra
+        capacity = self._vectors.shape[0]
+        if required <= capacity:
+            return
+        capacity = max(capacity, self.initial_capacity)
+        while capacity < required:
+            capacity *= 2
+        grown = np.zeros((capacity, self.dim), dtype=np.float32)
+        grown[: len(self._keys)] = self._vectors[: len(self._keys)]
+        self._vectors = grown
+
+    def add_batch(
+        self,
+        keys: Sequence[Hashable],
+        vectors: np.ndarray,
+        payloads: Optional[Sequence[Dict[str, object]]] = None,
+    ) -> None:
+        if payloads is None:
+            payloads = [{} for _ in keys]
+
+        with self.lock:
+            self._reserve(len(keys))
+            for key, vector, payload in zip(keys, vectors, payloads):
+                position = self._positions.get(key)
+                if position is None:
+                    position = len(self._keys)
+                    self._positions[key] = position
+                    self._keys.append(key)
+                    self._payloads.append(payload)
+                else:
+                    self._payloads[position] = payload
+                self._vectors[position] = vector
+
+    def search(self, query: np.ndarray, k: int = 5) -> List[Tuple[Hashable, float, Dict[str, object]]]:
+        with self.lock:
+            size = len(self._keys)
+            if size == 0 or k <= 0:
+                return []
+            scores = self._vectors[:size] @ query.astype(np.float32, copy=False)
+
+            if k < size:
+                top = np.argpartition(scores, size - k)[size - k :]
+            else:
+                top = np.arange(size)
+            top = top[np.argsort(scores[top])[::-1]]
+
+            return [(self._keys[i], float(scores[i]), self._payloads[i]) for i in top]
+
+
+class VectorStore:
+    """
+    Per-user vector indexes held in memory and filled incrementally from the database.
+
+    Allocated rows across all users are capped at `max_vectors` and indexes at `max_users`; past
+    either, the least recently used indexes are dropped. A dropped user gets a fresh index with zeroed watermarks on the next
+    question, which rebuilds it from the database.
+    """
+
+    def __init__(
+        self,
+        embedder: Optional[HashingEmbedder] = None,
+        max_vectors: int = INDEX_MAX_VECTORS,
+        max_users: int = INDEX_MAX_USERS,
+    ):
+        self.embedder = embedder or HashingEmbedder()
+        self.max_vectors = max_vectors
+        self.max_users = max_users
+        self._indexes: "OrderedDict[int, UserVectorIndex]" = OrderedDict()
+        self._charged: Dict[int, int] = {}
+        self._allocated = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._indexes)
+
+    @property
+    def allocated_vectors(self) -> int:
+        return self._allocated
+
+    def index_for(self, user_id: int) -> UserVectorIndex:
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is None:
+                index = UserVectorIndex(dim=self.embedder.dim)
+                self._indexes[user_id] = index
+                self._evict()
+            else:
+                self._indexes.move_to_end(user_id)
+            return index
+
+    def _charge(self, user_id: int, index: UserVectorIndex) -> None:
+        with self._lock:
+            if self._indexes.get(user_id) is not index:
+                # Evicted while it was being filled; its memory goes with the last reference
+                return
+            capacity = index.capacity
+            self._allocated += capacity - self._charged.get(user_id, 0)
+            self._charged[user_id] = capacity
+            self._evict()
+
+    def _evict(self) -> None:
+        # Called with self._lock held. The index just touched is the most recent one and is never
+        # dropped for its own growth.
+        while (self._allocated > self.max_vectors or len(self._indexes) > self.max_users) and len(self._indexes) > 1:
+            evicted, _ = self._indexes.popitem(last=False)
+            self._allocated -= self._charged.pop(evicted, 0)
+
+    def upsert_texts(
+        self,
+        user_id: int,
+        items: Iterable[Tuple[Hashable, str, Dict[str, object]]],
+        index: Optional[UserVectorIndex] = None,
+    ) -> int:
+        """Pass the `index` already obtained from `index_for` to keep filling it if it gets evicted meanwhile."""
+        items = list(items)
+        if not items:
+            return 0
+        keys = [key for key, _, _ in items]
+        vectors = self.embedder.embed_many([text for _, text, _ in items])
+        index = index or self.index_for(user_id)
+        index.add_batch(keys, vectors, [payload for _, _, payload in items])
+        self._charge(user_id, index)
+        return len(items)
+
+    def search(self, user_id: int, query: str, k: int = 5) -> List[Tuple[Hashable, float, Dict[str, object]]]:
+        return self.index_for(user_id).search(self.embedder.embed(query), k=k)
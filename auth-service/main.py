@@ -7,15 +7,19 @@ from fastapi import Depends, FastAPI, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from passlib.context import CryptContext
 from pydantic import BaseModel, EmailStr
-from sqlalchemy import Column, DateTime, Integer, String, create_engine
+from sqlalchemy import Column, DateTime, Integer, String, create_engine, inspect, text
 from sqlalchemy.orm import declarative_base, sessionmaker
 
+from shared.observability import install_observability, instrument_engine
+
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./auth.db")
 JWT_SECRET = os.getenv("JWT_SECRET", "super-secret-key")
+DEFAULT_PLAN = os.getenv("DEFAULT_PLAN", "Free")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
 
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {})
+instrument_engine(engine)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 Base = declarative_base()
 
@@ -29,6 +33,8 @@ class User(Base):
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True, nullable=False)
     password_hash = Column(String, nullable=False)
+    # Subscription tier, sent as the access token's `plan` claim (the gateway rate limits by it)
+    plan = Column(String, nullable=False, default=DEFAULT_PLAN)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
 
 
@@ -44,10 +50,16 @@ class UserCreate(BaseModel):
 
 
 app = FastAPI(title="Auth Service", version="0.1.0")
+install_observability(app, "auth")
 
 
 def init_db():
     Base.metadata.create_all(bind=engine)
+    # create_all does not alter existing tables: add the plan column to databases created before it
+    if "plan" not in {column["name"] for column in inspect(engine).get_columns("users")}:
+        with engine.begin() as connection:
+            default = DEFAULT_PLAN.replace("'", "''")
+            connection.execute(text(f"ALTER TABLE users ADD COLUMN plan VARCHAR NOT NULL DEFAULT '{default}'"))
 
 
 @app.on_event("startup")
@@ -71,7 +83,9 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
-def create_token(subject: str, token_type: str, expires_delta: datetime.timedelta) -> str:
+def create_token(
+    subject: str, token_type: str, expires_delta: datetime.timedelta, plan: Optional[str] = None
+) -> str:
     now = datetime.datetime.utcnow()
     payload = {
         "sub": subject,
@@ -79,6 +93,8 @@ def create_token(subject: str, token_type: str, expires_delta: datetime.timedelt
         "iat": now,
         "exp": now + expires_delta,
     }
+    if plan:
+        payload["plan"] = plan
     return jwt.encode(payload, JWT_SECRET, algorithm="HS256")
 
 
@@ -112,7 +128,9 @@ def register(user: UserCreate, db=Depends(get_db)):
     db.commit()
     db.refresh(new_user)
 
-    access_token = create_token(str(new_user.id), "access", datetime.timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+    access_token = create_token(
+        str(new_user.id), "access", datetime.timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES), new_user.plan
+    )
     refresh_token = create_token(str(new_user.id), "refresh", datetime.timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS))
 
     return Token(access_token=access_token, refresh_token=refresh_token)
@@ -124,7 +142,9 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db=Depends(get_db)):
     if not user or not verify_password(form_data.password, user.password_hash):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
 
-    access_token = create_token(str(user.id), "access", datetime.timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+    access_token = create_token(
+        str(user.id), "access", datetime.timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES), user.plan
+    )
     refresh_token = create_token(str(user.id), "refresh", datetime.timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS))
 
     return Token(access_token=access_token, refresh_token=refresh_token)
@@ -144,7 +164,9 @@ def refresh(request: RefreshRequest, db=Depends(get_db)):
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
 
-    access_token = create_token(str(user.id), "access", datetime.timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+    access_token = create_token(
+        str(user.id), "access", datetime.timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES), user.plan
+    )
     refresh_token = create_token(str(user.id), "refresh", datetime.timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS))
 
     return Token(access_token=access_token, refresh_token=refresh_token)
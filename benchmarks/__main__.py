@@ -0,0 +1,148 @@
+"""
+End-to-end load benchmark.
+
+    python -m benchmarks run --users 200 --transactions 500 --documents 20 \\
+        --requests 500 --concurrency 16 --mode asgi --output before.json
+    python -m benchmarks compare before.json after.json --threshold 10
+    python -m benchmarks layout --users 200 --transactions 200 --requests 500 --concurrency 16
+
+`run` seeds a fresh SQLite database (or DATABASE_URL when given), drives each endpoint with an
+async client and prints throughput, latency percentiles and DB queries per request as JSON.
+In `asgi` mode the measured app runs in this process through httpx.ASGITransport; in `uvicorn`
+mode every service runs in its own uvicorn subprocess. `compare` exits with status 1 when any
+endpoint's p95 latency regressed by more than --threshold percent. `layout` serves the same
+endpoints from six uvicorn processes and then from the single-process all-in-one app, and reports
+latency and resident memory of both along with what the all-in-one layout saves.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+JWT_SECRET = "benchmark-secret"
+
+
+def prepare_environment(args: argparse.Namespace) -> dict:
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="fiscal-bench-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    env = {
+        "DATABASE_URL": args.database_url or f"sqlite:///{workdir / 'bench.db'}",
+        "OBJECT_STORAGE_DIR": str(workdir / "storage"),
+        "CELERY_TASK_ALWAYS_EAGER": "true",
+        "JWT_SECRET": JWT_SECRET,
+        # The limiter stays in the path (its cost is measured) but must not turn load into 429s
+        "RATE_LIMIT_FREE_BURST": "1000000",
+        "RATE_LIMIT_FREE_PER_MINUTE": "1000000",
+    }
+    # Must be in place before any service module creates its engine
+    os.environ.update(env)
+    return env
+
+
+def run(args: argparse.Namespace) -> dict:
+    env = prepare_environment(args)
+
+    from .load import ServiceProcesses, default_scenarios, run_scenarios
+    from .seed import seed_database
+
+    seeded = seed_database(args.users, args.transactions, args.documents, seed=args.seed)
+
+    scenarios = default_scenarios(args.users, JWT_SECRET)
+    if args.endpoints:
+        scenarios = [scenario for scenario in scenarios if scenario.route in args.endpoints]
+
+    processes = ServiceProcesses(env)
+    try:
+        endpoints = asyncio.run(
+            run_scenarios(scenarios, args.mode, args.requests, args.concurrency, args.warmup, processes, args.seed)
+        )
+    finally:
+        processes.stop()
+
+    return {
+        "config": {
+            "mode": args.mode,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "database_url": env["DATABASE_URL"],
+            "seed": seeded,
+        },
+        "endpoints": endpoints,
+    }
+
+
+def layout(args: argparse.Namespace) -> dict:
+    env = prepare_environment(args)
+
+    from .layout import LAYOUT_ROUTES, compare_layouts, measure_layout
+    from .load import default_scenarios
+    from .seed import seed_database
+
+    seeded = seed_database(args.users, args.transactions, args.documents, seed=args.seed)
+    scenarios = [
+        scenario for scenario in default_scenarios(args.users, JWT_SECRET) if scenario.route in LAYOUT_ROUTES
+    ]
+
+    layouts = {
+        name: asyncio.run(
+            measure_layout(name, scenarios, env, args.requests, args.concurrency, args.warmup, args.seed)
+        )
+        for name in ("multi_process", "all_in_one")
+    }
+    return {
+        "config": {"requests": args.requests, "concurrency": args.concurrency, "seed": seeded},
+        **layouts,
+        "saved": compare_layouts(layouts["multi_process"], layouts["all_in_one"]),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="seed the database and load-test the endpoints")
+    layout_parser = commands.add_parser("layout", help="compare multi-process and all-in-one deployments")
+    for sub in (run_parser, layout_parser):
+        sub.add_argument("--users", type=int, default=100)
+        sub.add_argument("--transactions", type=int, default=200, help="transactions per user")
+        sub.add_argument("--documents", type=int, default=10, help="documents per user")
+        sub.add_argument("--requests", type=int, default=300, help="measured requests per endpoint")
+        sub.add_argument("--concurrency", type=int, default=16)
+        sub.add_argument("--warmup", type=int, default=20)
+        sub.add_argument("--database-url")
+        sub.add_argument("--workdir")
+        sub.add_argument("--seed", type=int, default=7)
+        sub.add_argument("--output")
+    run_parser.add_argument("--mode", choices=["asgi", "uvicorn"], default="asgi")
+    run_parser.add_argument("--endpoints", nargs="*", help="routes to run, e.g. /dashboard /limits/summary")
+
+    compare_parser = commands.add_parser("compare", help="diff two run reports")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--threshold", type=float, default=10.0, help="allowed p95 regression in percent")
+
+    args = parser.parse_args()
+
+    if args.command in ("run", "layout"):
+        report = run(args) if args.command == "run" else layout(args)
+        text = json.dumps(report, indent=2, ensure_ascii=False)
+        if args.output:
+            Path(args.output).write_text(text + "\n")
+        print(text)
+        return
+
+    from .load import compare_reports
+
+    baseline = json.loads(Path(args.baseline).read_text())
+    candidate = json.loads(Path(args.candidate).read_text())
+    comparison = compare_reports(baseline, candidate, args.threshold)
+    print(json.dumps(comparison, indent=2, ensure_ascii=False))
+    sys.exit(1 if comparison["regressions"] else 0)
+
+
+if __name__ == "__main__":
+    main()
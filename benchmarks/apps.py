@@ -0,0 +1,22 @@
+import os
+import sys
+
+from shared.services import REPO_ROOT, SERVICES
+
+# Not a single service: every service behind one uvicorn process
+ALL_IN_ONE = "all_in_one"
+
+
+def uvicorn_command(name: str, port: int) -> list:
+    module_name, app_dir = ("shared.all_in_one", None) if name == ALL_IN_ONE else SERVICES[name]
+    command = [sys.executable, "-m", "uvicorn", f"{module_name}:app", "--port", str(port), "--log-level", "warning"]
+    if app_dir is not None:
+        command += ["--app-dir", str(app_dir)]
+    return command
+
+
+def uvicorn_env(**overrides: str) -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(REPO_ROOT), env.get("PYTHONPATH")]))
+    env.update(overrides)
+    return env
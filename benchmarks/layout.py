@@ -0,0 +1,80 @@
+import random
+from typing import Dict, List
+
+import httpx
+
+from .apps import ALL_IN_ONE
+from .load import Scenario, ServiceProcesses, drive
+
+# Started in the multi-process layout even if no scenario hits them, so memory covers all six
+MULTI_PROCESS_ORDER = ["limits", "billing", "assistant", "auth", "documents", "gateway"]
+LAYOUT_ROUTES = ["/dashboard", "/assistant/chat", "/limits/summary"]
+
+
+def start_multi_process(processes: ServiceProcesses) -> Dict[str, str]:
+    urls = {}
+    for name in MULTI_PROCESS_ORDER:
+        extra_env = {}
+        if name == "gateway":
+            extra_env["LIMITS_SERVICE_URL"] = urls["limits"]
+            extra_env["ASSISTANT_SERVICE_URL"] = urls["assistant"]
+        if name == "assistant":
+            extra_env["BILLING_SERVICE_URL"] = urls["billing"]
+        urls[name] = processes.start(name, **extra_env)
+    # Chat goes through the gateway (auth and rate limit), as it does in the all-in-one layout
+    urls["assistant"] = urls["gateway"]
+    return urls
+
+
+def start_all_in_one(processes: ServiceProcesses) -> Dict[str, str]:
+    # Preloaded so resident memory includes every service, as in the multi-process layout
+    url = processes.start(ALL_IN_ONE, ALL_IN_ONE_PRELOAD="true")
+    return {name: url for name in MULTI_PROCESS_ORDER}
+
+
+async def measure_layout(
+    layout: str,
+    scenarios: List[Scenario],
+    env: Dict[str, str],
+    requests: int,
+    concurrency: int,
+    warmup: int,
+    seed: int,
+) -> Dict[str, object]:
+    processes = ServiceProcesses(env)
+    rng = random.Random(seed)
+    try:
+        urls = start_multi_process(processes) if layout == "multi_process" else start_all_in_one(processes)
+        endpoints = {}
+        for scenario in scenarios:
+            async with httpx.AsyncClient(base_url=urls[scenario.service], timeout=60) as client:
+                if warmup:
+                    await drive(client, scenario, warmup, min(concurrency, warmup), rng)
+                endpoints[scenario.name] = await drive(client, scenario, requests, concurrency, rng)
+        rss = processes.rss_bytes()
+    finally:
+        processes.stop()
+
+    return {
+        "processes": len(rss),
+        "rss_mb": {name: round(size / 2**20, 1) for name, size in rss.items()},
+        "rss_total_mb": round(sum(rss.values()) / 2**20, 1),
+        "endpoints": endpoints,
+    }
+
+
+def compare_layouts(multi_process: Dict[str, object], all_in_one: Dict[str, object]) -> Dict[str, object]:
+    """Saved latency (ms) and memory (MB) of all-in-one relative to multi-process; positive is better."""
+    endpoints = {}
+    for name, base in multi_process["endpoints"].items():
+        head = all_in_one["endpoints"][name]
+        endpoints[name] = {
+            f"{quantile}_saved_ms": round(base["latency_ms"][quantile] - head["latency_ms"][quantile], 2)
+            for quantile in ("p50", "p95", "p99")
+        }
+        endpoints[name]["throughput_ratio"] = round(head["throughput_rps"] / base["throughput_rps"], 2)
+
+    return {
+        "rss_saved_mb": round(multi_process["rss_total_mb"] - all_in_one["rss_total_mb"], 1),
+        "endpoints": endpoints,
+    }
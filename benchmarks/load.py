@@ -0,0 +1,271 @@
+import asyncio
+import datetime
+import random
+import re
+import socket
+import subprocess
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import httpx
+import numpy as np
+
+from shared.services import load_service_module
+
+from .apps import uvicorn_command, uvicorn_env
+
+CHAT_MESSAGES = [
+    "quanto faturei mês passado?",
+    "quanto falta para o limite do MEI?",
+    "qual o imposto estimado deste mês?",
+    "quantos documentos enviei este ano?",
+    "quais serviços de consultoria fiz em Curitiba?",
+    "me ajude a entender meu faturamento recente",
+]
+
+# Downstream services each target calls over HTTP, started even when the target runs in-process
+DEPENDENCIES = {"gateway": ["limits"], "assistant": ["billing"]}
+
+
+class Scenario(NamedTuple):
+    name: str
+    service: str
+    method: str
+    route: str
+    build: Callable[[random.Random, int], Dict[str, object]]
+
+
+def default_scenarios(users: int, jwt_secret: str) -> List[Scenario]:
+    import jwt
+
+    tokens = {}
+
+    def bearer(user_id: int) -> Dict[str, str]:
+        if user_id not in tokens:
+            expires = datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+            tokens[user_id] = jwt.encode({"sub": str(user_id), "type": "access", "exp": expires}, jwt_secret, "HS256")
+        return {"Authorization": f"Bearer {tokens[user_id]}"}
+
+    def chat(user_id: int, i: int) -> Dict[str, object]:
+        return {
+            "url": "/assistant/chat",
+            "json": {"user_id": user_id, "message": CHAT_MESSAGES[i % len(CHAT_MESSAGES)]},
+            # Ignored by the assistant itself, required when the request goes through the gateway
+            "headers": bearer(user_id),
+        }
+
+    year = datetime.date.today().year
+    return [
+        Scenario(
+            "GET /dashboard", "gateway", "GET", "/dashboard",
+            lambda rng, i: {"url": "/dashboard", "headers": bearer(rng.randint(1, users))},
+        ),
+        Scenario(
+            "GET /limits/summary", "limits", "GET", "/limits/summary",
+            lambda rng, i: {"url": "/limits/summary", "params": {"year": year, "user_id": rng.randint(1, users)}},
+        ),
+        Scenario(
+            "POST /assistant/chat", "assistant", "POST", "/assistant/chat",
+            lambda rng, i: chat(rng.randint(1, users), i),
+        ),
+        Scenario(
+            "POST /billing/track-usage", "billing", "POST", "/billing/track-usage",
+            lambda rng, i: {
+                "url": "/billing/track-usage",
+                "json": {"user_id": rng.randint(1, users), "tokens_used": rng.randint(1, 500), "api_calls": 1},
+            },
+        ),
+        Scenario(
+            "POST /documents/upload", "documents", "POST", "/documents/upload",
+            lambda rng, i: {
+                "url": "/documents/upload",
+                "data": {"user_id": str(rng.randint(1, users))},
+                "files": {"file": (f"nf_{i}.txt", f"Serviço prestado\n{rng.uniform(50, 3000):.2f} {datetime.date.today()}")},
+            },
+        ),
+    ]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class ServiceProcesses:
+    """Runs services under uvicorn subprocesses for the duration of a benchmark."""
+
+    def __init__(self, env: Dict[str, str]):
+        self.env = env
+        self.urls: Dict[str, str] = {}
+        self.processes: Dict[str, subprocess.Popen] = {}
+
+    def start(self, name: str, **extra_env: str) -> str:
+        if name in self.urls:
+            return self.urls[name]
+        port = _free_port()
+        process = subprocess.Popen(uvicorn_command(name, port), env=uvicorn_env(**self.env, **extra_env))
+        self.processes[name] = process
+        url = f"http://127.0.0.1:{port}"
+
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"{name} exited with code {process.returncode}")
+            try:
+                httpx.get(f"{url}/metrics", timeout=1)
+                break
+            except httpx.HTTPError:
+                time.sleep(0.2)
+        else:
+            raise RuntimeError(f"{name} did not start on {url}")
+
+        self.urls[name] = url
+        return url
+
+    def rss_bytes(self) -> Dict[str, int]:
+        """Resident set size of each running service, read from /proc (Linux only)."""
+        sizes = {}
+        for name, process in self.processes.items():
+            with open(f"/proc/{process.pid}/status") as status:
+                for line in status:
+                    if line.startswith("VmRSS:"):
+                        sizes[name] = int(line.split()[1]) * 1024
+        return sizes
+
+    def stop(self) -> None:
+        for process in self.processes.values():
+            process.terminate()
+        for process in self.processes.values():
+            process.wait(timeout=10)
+
+
+DB_QUERIES_SAMPLE = re.compile(r'^http_request_db_queries_total\{(?P<labels>[^}]*)\} (?P<value>\S+)$', re.MULTILINE)
+
+
+async def scrape_db_queries(client: httpx.AsyncClient, service_label: str, method: str, route: str) -> float:
+    response = await client.get("/metrics")
+    expected = {f'service="{service_label}"', f'method="{method}"', f'route="{route}"'}
+    for sample in DB_QUERIES_SAMPLE.finditer(response.text):
+        if expected <= set(sample.group("labels").split(",")):
+            return float(sample.group("value"))
+    return 0.0
+
+
+async def drive(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    requests: int,
+    concurrency: int,
+    rng: random.Random,
+) -> Dict[str, object]:
+    latencies: List[float] = []
+    errors = 0
+    issued = 0
+
+    async def worker():
+        nonlocal errors, issued
+        while issued < requests:
+            position = issued
+            issued += 1
+            kwargs = scenario.build(rng, position)
+            started = time.perf_counter()
+            try:
+                response = await client.request(scenario.method, **kwargs)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            latencies.append(time.perf_counter() - started)
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "requests": requests,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 1),
+        "latency_ms": {
+            "mean": round(float(latencies_ms.mean()), 2),
+            "p50": round(float(np.percentile(latencies_ms, 50)), 2),
+            "p95": round(float(np.percentile(latencies_ms, 95)), 2),
+            "p99": round(float(np.percentile(latencies_ms, 99)), 2),
+            "max": round(float(latencies_ms.max()), 2),
+        },
+    }
+
+
+SERVICE_LABELS = {"gateway": "api-gateway"}
+
+
+async def run_scenarios(
+    scenarios: List[Scenario],
+    mode: str,
+    requests: int,
+    concurrency: int,
+    warmup: int,
+    processes: ServiceProcesses,
+    seed: int,
+) -> Dict[str, object]:
+    results: Dict[str, object] = {}
+    rng = random.Random(seed)
+
+    for scenario in scenarios:
+        dependency_urls = {name: processes.start(name) for name in DEPENDENCIES.get(scenario.service, [])}
+
+        if mode == "asgi":
+            module = load_service_module(scenario.service)
+            if "limits" in dependency_urls:
+                module.LIMITS_SERVICE_URL = dependency_urls["limits"]
+            if "billing" in dependency_urls:
+                module.BILLING_SERVICE_URL = dependency_urls["billing"]
+            if hasattr(module, "startup_event"):
+                module.startup_event()
+            transport = httpx.ASGITransport(app=module.app)
+            client = httpx.AsyncClient(transport=transport, base_url=f"http://{scenario.service}", timeout=60)
+        else:
+            env = {f"{name.upper()}_SERVICE_URL": url for name, url in dependency_urls.items()}
+            url = processes.start(scenario.service, **env)
+            client = httpx.AsyncClient(base_url=url, timeout=60)
+
+        async with client:
+            label = SERVICE_LABELS.get(scenario.service, scenario.service)
+            if warmup:
+                await drive(client, scenario, warmup, min(concurrency, warmup), rng)
+            queries_before = await scrape_db_queries(client, label, scenario.method, scenario.route)
+            result = await drive(client, scenario, requests, concurrency, rng)
+            queries_after = await scrape_db_queries(client, label, scenario.method, scenario.route)
+
+        result["service"] = scenario.service
+        result["db_queries_per_request"] = round((queries_after - queries_before) / requests, 2)
+        results[scenario.name] = result
+
+    return results
+
+
+def compare_reports(baseline: Dict[str, object], candidate: Dict[str, object], threshold_pct: float) -> Dict[str, object]:
+    """Per-endpoint relative change (candidate vs baseline); positive latency deltas are slower."""
+    endpoints = {}
+    regressions = []
+
+    def pct(new: float, old: float) -> Optional[float]:
+        return round((new - old) / old * 100, 1) if old else None
+
+    for name, base in baseline["endpoints"].items():
+        head = candidate["endpoints"].get(name)
+        if head is None:
+            continue
+        delta = {
+            "throughput_rps_pct": pct(head["throughput_rps"], base["throughput_rps"]),
+            "db_queries_per_request": round(head["db_queries_per_request"] - base["db_queries_per_request"], 2),
+        }
+        for quantile in ("p50", "p95", "p99"):
+            delta[f"{quantile}_pct"] = pct(head["latency_ms"][quantile], base["latency_ms"][quantile])
+        if (delta["p95_pct"] or 0) > threshold_pct:
+            regressions.append(name)
+        endpoints[name] = delta
+
+    return {"threshold_pct": threshold_pct, "regressions": regressions, "endpoints": endpoints}
@@ -0,0 +1,84 @@
+"""
+Per-request cost of the api-gateway rate limit check.
+
+    python -m benchmarks.rate_limit --checks 200000 --users 1000
+    python -m benchmarks.rate_limit --store redis://localhost:6379/0 --checks 20000
+    python -m benchmarks.rate_limit --store fakeredis:// --checks 20000
+
+Before timing, exhausts one bucket on the chosen store and fails unless the next check is denied
+with a Retry-After header (what the gateway turns into a 429). Then times `RateLimiter.check`
+(bucket update plus the decision and its headers), cycling over `--users` subjects so buckets stay
+warm, and reports the mean and p99 cost per check in microseconds. `fakeredis://` runs the Redis
+store's Lua script in process (requires `pip install fakeredis[lua]`).
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+
+from shared.rate_limit import RateLimiter, RateLimitPolicy, RedisRateLimitStore, create_store, policies_from_env
+
+
+def make_store(store_url: str):
+    if store_url.startswith("fakeredis://"):
+        import fakeredis
+
+        return RedisRateLimitStore(fakeredis.FakeAsyncRedis())
+    return create_store(store_url)
+
+
+async def check_burst(store) -> dict:
+    policy = RateLimitPolicy(burst=3, per_minute=6)
+    limiter = RateLimiter(store, {"free": policy}, default_plan="free")
+    subject = f"burst-check-{time.time_ns()}"
+    decisions = [await limiter.check(subject, "free") for _ in range(policy.burst + 1)]
+    if not all(decision.allowed for decision in decisions[:-1]):
+        raise RuntimeError(f"burst of {policy.burst} was not allowed: {decisions}")
+    denied = decisions[-1]
+    headers = denied.headers()
+    if denied.allowed or int(headers.get("Retry-After", 0)) < 1:
+        raise RuntimeError(f"exhausted bucket was not denied with Retry-After: {denied}")
+    return {"denied_after": policy.burst, "retry_after": headers["Retry-After"]}
+
+
+async def measure(store_url: str, checks: int, users: int) -> dict:
+    store = make_store(store_url)
+    burst_check = await check_burst(store)
+    limiter = RateLimiter(store, policies_from_env())
+    subjects = [str(user_id) for user_id in range(users)]
+    timings = np.empty(checks)
+
+    allowed = 0
+    for position in range(checks):
+        started = time.perf_counter()
+        decision = await limiter.check(subjects[position % users], "free")
+        decision.headers()
+        timings[position] = time.perf_counter() - started
+        allowed += decision.allowed
+
+    timings_us = timings * 1e6
+    return {
+        "store": store_url,
+        "burst_check": burst_check,
+        "checks": checks,
+        "allowed": allowed,
+        "mean_us": round(float(timings_us.mean()), 2),
+        "p50_us": round(float(np.percentile(timings_us, 50)), 2),
+        "p99_us": round(float(np.percentile(timings_us, 99)), 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--store", default="memory://")
+    parser.add_argument("--checks", type=int, default=200_000)
+    parser.add_argument("--users", type=int, default=1000)
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(measure(args.store, args.checks, args.users)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Seeds the shared database with a synthetic tenant base.
+
+The database is whatever DATABASE_URL points at when `shared.database` is first imported, so set
+it before calling into this module (the benchmark CLI does).
+"""
+import datetime
+import random
+import time
+from typing import Dict
+
+from sqlalchemy import insert
+
+from .vector_search import CITIES, SERVICES
+
+CHUNK_SIZE = 10_000
+
+
+def seed_database(users: int, transactions_per_user: int, documents_per_user: int, seed: int = 7) -> Dict[str, object]:
+    from billing_service.main import init_db as init_billing
+    from shared.database import engine
+    from shared.models import Document, Transaction
+
+    init_billing()
+    rng = random.Random(seed)
+    today = datetime.date.today()
+    now = datetime.datetime.utcnow()
+    started = time.perf_counter()
+
+    with engine.begin() as connection:
+        documents = []
+        for user_id in range(1, users + 1):
+            for position in range(documents_per_user):
+                processed = rng.random() < 0.9
+                documents.append(
+                    {
+                        "user_id": user_id,
+                        "filename": f"nf_{user_id}_{position}.pdf",
+                        "storage_path": "",
+                        "status": "completed" if processed else "pending",
+                        "uploaded_at": now,
+                        "processed_at": now if processed else None,
+                        "total_value": round(rng.uniform(50, 3000), 2) if processed else None,
+                        "description": rng.choice(SERVICES) if processed else None,
+                    }
+                )
+                if len(documents) >= CHUNK_SIZE:
+                    connection.execute(insert(Document), documents)
+                    documents = []
+        if documents:
+            connection.execute(insert(Document), documents)
+
+        transactions = []
+        for user_id in range(1, users + 1):
+            for _ in range(transactions_per_user):
+                transactions.append(
+                    {
+                        "user_id": user_id,
+                        "document_id": None,
+                        "amount": round(rng.uniform(50, 3000), 2),
+                        "transaction_date": today - datetime.timedelta(days=rng.randrange(730)),
+                        "description": f"{rng.choice(SERVICES)} em {rng.choice(CITIES)}",
+                        "created_at": now,
+                    }
+                )
+                if len(transactions) >= CHUNK_SIZE:
+                    connection.execute(insert(Transaction), transactions)
+                    transactions = []
+        if transactions:
+            connection.execute(insert(Transaction), transactions)
+
+    return {
+        "users": users,
+        "transactions": users * transactions_per_user,
+        "documents": users * documents_per_user,
+        "seconds": round(time.perf_counter() - started, 2),
+    }
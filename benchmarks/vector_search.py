@@ -0,0 +1,113 @@
+"""
+Recall and latency benchmark for the assistant's local vector index.
+
+    python -m benchmarks.vector_search --vectors 1000000 --queries 200 --k 10
+
+A synthetic corpus of transaction descriptions (service, client, city, month) is embedded with
+the production HashingEmbedder. Each query is a shortened, unaccented and upper-cased rewrite of
+a random description; recall@k is the share of queries whose source record comes back in the
+top k results.
+"""
+import argparse
+import json
+import random
+import time
+from typing import List
+
+import numpy as np
+
+from assistant_service.retrieval import HashingEmbedder, UserVectorIndex
+
+SERVICES = [
+    "Consultoria contábil", "Manutenção de computadores", "Design gráfico", "Aula particular",
+    "Serviço de fotografia", "Desenvolvimento de site", "Reforma elétrica", "Instalação de ar-condicionado",
+    "Tradução técnica", "Buffet para eventos", "Corte de cabelo", "Transporte de mudança",
+    "Gestão de redes sociais", "Personal trainer", "Conserto de celular", "Limpeza pós-obra",
+]
+CITIES = [
+    "São Paulo", "Belo Horizonte", "Curitiba", "Porto Alegre", "Salvador", "Recife", "Fortaleza",
+    "Goiânia", "Florianópolis", "Campinas", "Niterói", "Manaus", "Belém", "Vitória",
+]
+SYLLABLES = ["ma", "ri", "so", "lu", "ca", "de", "fer", "nan", "pe", "dro", "al", "ves", "gon", "tei", "xa", "ra"]
+
+
+def _client_names(count: int, rng: random.Random) -> List[str]:
+    names = set()
+    while len(names) < count:
+        first = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+        last = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+        names.add(f"{first} {last}")
+    return sorted(names)
+
+
+def build_corpus(size: int, clients: int, rng: random.Random) -> List[str]:
+    names = _client_names(clients, rng)
+    return [
+        f"{rng.choice(SERVICES)} para {rng.choice(names)} em {rng.choice(CITIES)} "
+        f"NF {rng.randint(1, 99999)} {rng.randint(1, 12):02d}/{rng.randint(2019, 2025)}"
+        for _ in range(size)
+    ]
+
+
+def perturb(text: str, rng: random.Random) -> str:
+    words = text.split()
+    keep = [word for word in words if rng.random() > 0.25 or word.isdigit()]
+    return " ".join(keep or words).upper()
+
+
+def run(vectors: int, queries: int, k: int, dim: int, clients: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    embedder = HashingEmbedder(dim=dim)
+    corpus = build_corpus(vectors, clients, rng)
+
+    started = time.perf_counter()
+    index = UserVectorIndex(dim=dim, initial_capacity=vectors)
+    batch = 50_000
+    for offset in range(0, vectors, batch):
+        texts = corpus[offset : offset + batch]
+        index.add_batch(range(offset, offset + len(texts)), embedder.embed_many(texts))
+    build_seconds = time.perf_counter() - started
+
+    targets = [rng.randrange(vectors) for _ in range(queries)]
+    latencies = []
+    hits = 0
+    for target in targets:
+        query = perturb(corpus[target], rng)
+        started = time.perf_counter()
+        results = index.search(embedder.embed(query), k=k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        hits += any(key == target for key, _, _ in results)
+
+    latencies_ms = np.array(latencies)
+    return {
+        "vectors": vectors,
+        "dim": dim,
+        "k": k,
+        "queries": queries,
+        "index_mb": round(index._vectors.nbytes / 2**20, 1),
+        "build_seconds": round(build_seconds, 2),
+        "embed_per_second": round(vectors / build_seconds),
+        f"recall_at_{k}": round(hits / queries, 4),
+        "latency_ms": {
+            "p50": round(float(np.percentile(latencies_ms, 50)), 2),
+            "p95": round(float(np.percentile(latencies_ms, 95)), 2),
+            "p99": round(float(np.percentile(latencies_ms, 99)), 2),
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--clients", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.vectors, args.queries, args.k, args.dim, args.clients, args.seed), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -5,41 +5,15 @@ from typing import Optional
 from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from sqlalchemy import Column, Date, Float, ForeignKey, Integer, String, create_engine, func
-from sqlalchemy.orm import Session, declarative_base, relationship, sessionmaker
-
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./saas.db")
-DEFAULT_PLAN_NAME = os.getenv("DEFAULT_PLAN_NAME", "Free")
-
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {},
-)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
-Base = declarative_base()
-
-
-class Plan(Base):
-    __tablename__ = "plans"
-
-    id = Column(Integer, primary_key=True)
-    name = Column(String, unique=True, nullable=False)
-    token_limit = Column(Integer, default=5000)
-    monthly_price = Column(Float, default=0.0)
+from sqlalchemy import func
+from sqlalchemy.orm import Session
 
+from shared import database
+from shared.database import SessionLocal, get_db
+from shared.models import Plan, Usage
+from shared.observability import install_observability
 
-class Usage(Base):
-    __tablename__ = "usages"
-
-    id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, index=True, nullable=False)
-    plan_id = Column(Integer, ForeignKey("plans.id"), nullable=False)
-    period_start = Column(Date, index=True, nullable=False)
-    tokens_used = Column(Integer, default=0)
-    uploads = Column(Integer, default=0)
-    api_calls = Column(Integer, default=0)
-
-    plan = relationship("Plan")
+DEFAULT_PLAN_NAME = os.getenv("DEFAULT_PLAN_NAME", "Free")
 
 
 class TrackUsageRequest(BaseModel):
@@ -65,9 +39,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+install_observability(app, "billing")
+
 
 def init_db():
-    Base.metadata.create_all(bind=engine)
+    database.init_db()
     with SessionLocal() as db:
         if not db.query(Plan).count():
             plans = [
@@ -83,14 +59,6 @@ def startup_event():
     init_db()
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 def get_or_create_usage(db: Session, user_id: int, plan: Plan, period_start: datetime.date) -> Usage:
     usage = (
         db.query(Usage)
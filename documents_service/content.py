@@ -0,0 +1,129 @@
+"""
+Serving stored documents over HTTP with Range and ETag support.
+
+Local files go out as mmap-backed chunks, so the file is never read into Python memory as a whole.
+Objects without a local file (S3) are streamed from the backend with a ranged GET.
+"""
+import mimetypes
+import mmap
+from pathlib import Path, PurePosixPath
+from typing import Dict, Optional, Tuple
+from urllib.parse import quote
+
+import anyio
+from starlette.responses import Response, StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from .storage import ObjectInfo
+
+CHUNK_SIZE = 256 * 1024
+ByteRange = Tuple[int, int]
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[ByteRange]:
+    """
+    Returns the inclusive (start, end) of a single `bytes=` range, or None to send the whole file.
+    Multiple ranges are answered with the whole file, which RFC 9110 allows.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+
+    first, _, last = spec.strip().partition("-")
+    try:
+        if not first:
+            suffix = int(last)
+            if suffix <= 0 or size == 0:
+                raise RangeNotSatisfiable()
+            return max(0, size - suffix), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        raise RangeNotSatisfiable()
+    return start, min(end, size - 1)
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def content_headers(info: ObjectInfo, filename: str) -> Dict[str, str]:
+    filename = PurePosixPath(filename.replace("\\", "/")).name
+    return {
+        "ETag": info.etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, max-age=0, must-revalidate",
+        "Content-Disposition": f"inline; filename*=UTF-8''{quote(filename)}",
+    }
+
+
+def media_type_for(filename: str) -> str:
+    return mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+
+class MmapFileResponse(Response):
+    def __init__(self, path: Path, byte_range: ByteRange, status_code: int, headers: Dict[str, str], media_type: str):
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.path = path
+        self.start, self.end = byte_range
+        self.headers["content-length"] = str(self.end - self.start + 1)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        length = self.end - self.start + 1
+        if scope["method"] == "HEAD" or length == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        with open(self.path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                for offset in range(self.start, self.end + 1, CHUNK_SIZE):
+                    # Slicing may fault pages in from disk, so it runs off the event loop
+                    chunk = await anyio.to_thread.run_sync(mapped.__getitem__, slice(offset, min(offset + CHUNK_SIZE, self.end + 1)))
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def content_response(storage, key: str, filename: str, request_headers) -> Response:
+    """Raises FileNotFoundError when the object is missing."""
+    info = storage.stat(key)
+    headers = content_headers(info, filename)
+    if etag_matches(request_headers.get("if-none-match"), info.etag):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request_headers.get("range")
+    if_range = request_headers.get("if-range")
+    if if_range and if_range.strip() != info.etag:
+        range_header = None
+    try:
+        byte_range = parse_range(range_header, info.size)
+    except RangeNotSatisfiable:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{info.size}"})
+
+    status_code = 200
+    if byte_range is None:
+        byte_range = (0, info.size - 1)
+    else:
+        status_code = 206
+        headers["Content-Range"] = f"bytes {byte_range[0]}-{byte_range[1]}/{info.size}"
+
+    media_type = media_type_for(filename)
+    path = storage.local_path(key)
+    if path is not None:
+        return MmapFileResponse(path, byte_range, status_code, headers, media_type)
+
+    start, end = byte_range
+    headers["Content-Length"] = str(end - start + 1)
+    body = storage.iter_range(key, start, end, CHUNK_SIZE) if end >= start else iter(())
+    return StreamingResponse(body, status_code=status_code, headers=headers, media_type=media_type)
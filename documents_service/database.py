@@ -1,19 +0,0 @@
-import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
-
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./saas.db")
-
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {},
-)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
-Base = declarative_base()
-
-
-def init_db():
-    # Import models to ensure tables are registered
-    from . import models  # noqa: F401
-
-    Base.metadata.create_all(bind=engine)
@@ -1,15 +1,14 @@
-import os
-from pathlib import Path
-
-from fastapi import Depends, FastAPI, File, Form, HTTPException, UploadFile
+from fastapi import Depends, FastAPI, File, Form, HTTPException, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 
-from .database import SessionLocal, init_db
-from .models import Document
-from .worker import process_document
+from shared.database import get_db, get_read_db, init_db
+from shared.models import Document
+from shared.observability import install_observability
 
-OBJECT_STORAGE_DIR = Path(os.getenv("OBJECT_STORAGE_DIR", "./storage"))
+from .content import content_response
+from .storage import OBJECT_STORAGE_DIR, STORAGE_BACKEND, get_storage, object_key
+from .worker import process_document
 
 app = FastAPI(title="Documents Service", version="0.2.0")
 
@@ -21,28 +20,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+install_observability(app, "documents")
+
 
 @app.on_event("startup")
 def startup_event():
     init_db()
-    OBJECT_STORAGE_DIR.mkdir(parents=True, exist_ok=True)
-
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+    if STORAGE_BACKEND == "local":
+        OBJECT_STORAGE_DIR.mkdir(parents=True, exist_ok=True)
 
 
 @app.post("/documents/upload")
-async def upload_document(
+def upload_document(
     user_id: int = Form(...),
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
 ):
     filename = file.filename or "uploaded_document"
+    # Sync endpoint: the DB writes and a broker-less fallback to inline OCR must not block the event loop
+    content = file.file.read()
+
     document = Document(
         user_id=user_id,
         filename=filename,
@@ -52,25 +49,26 @@ async def upload_document(
     db.add(document)
     db.commit()
     db.refresh(document)
+    document_id = document.id
 
-    storage_path = OBJECT_STORAGE_DIR / f"{document.id}_{filename}"
-    with open(storage_path, "wb") as f:
-        f.write(await file.read())
+    key = object_key(document_id, filename)
+    get_storage().put(key, content, file.content_type)
 
-    document.storage_path = str(storage_path)
+    document.storage_path = key
+    # Commit releases this session's connection before the task opens its own
     db.commit()
 
     try:
-        process_document.apply_async(args=[document.id])
+        process_document.apply_async(args=[document_id])
     except Exception:
         # If the broker is unavailable, process synchronously for demo purposes
-        process_document(document.id)  # type: ignore[arg-type]
+        process_document(document_id)  # type: ignore[arg-type]
 
     return {"document_id": document.id, "status": document.status, "storage_path": document.storage_path}
 
 
 @app.get("/documents/{document_id}")
-def get_document(document_id: int, db: Session = Depends(get_db)):
+def get_document(document_id: int, db: Session = Depends(get_read_db)):
     document = db.query(Document).filter(Document.id == document_id).first()
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
@@ -84,3 +82,15 @@ def get_document(document_id: int, db: Session = Depends(get_db)):
         "transaction_date": document.transaction_date.isoformat() if document.transaction_date else None,
         "description": document.description,
     }
+
+
+@app.get("/documents/{document_id}/content")
+def get_document_content(document_id: int, request: Request, db: Session = Depends(get_read_db)):
+    document = db.query(Document).filter(Document.id == document_id).first()
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    try:
+        return content_response(get_storage(), document.storage_path, document.filename, request.headers)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Document content not found")
@@ -1,45 +0,0 @@
-import datetime
-from sqlalchemy import Column, Date, DateTime, Float, Integer, String, Text
-from sqlalchemy.orm import relationship
-
-from .database import Base
-
-
-class Document(Base):
-    __tablename__ = "documents"
-
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, index=True, nullable=False)
-    filename = Column(String, nullable=False)
-    storage_path = Column(String, nullable=False)
-    status = Column(String, nullable=False, default="pending")
-    uploaded_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
-    processed_at = Column(DateTime)
-    total_value = Column(Float)
-    transaction_date = Column(Date)
-    description = Column(String)
-
-    transaction = relationship("Transaction", back_populates="document", uselist=False)
-
-
-class Transaction(Base):
-    __tablename__ = "transactions"
-
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, index=True, nullable=False)
-    document_id = Column(Integer, index=True, nullable=True)
-    amount = Column(Float, nullable=False)
-    transaction_date = Column(Date, nullable=False)
-    description = Column(String)
-    created_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
-
-    document = relationship("Document", back_populates="transaction")
-
-
-class Event(Base):
-    __tablename__ = "events"
-
-    id = Column(Integer, primary_key=True, index=True)
-    event_type = Column(String, nullable=False)
-    payload = Column(Text)
-    created_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
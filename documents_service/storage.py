@@ -0,0 +1,156 @@
+"""
+Object storage for uploaded documents.
+
+Documents are stored under keys like `3f/a2/1234_nota_fiscal.pdf`: two directory levels taken
+from a hash of the document id spread millions of files over 65,536 shards instead of one flat
+directory. `documents.storage_path` holds the key. Rows written before the sharded layout hold a
+filesystem path instead, and every backend still reads those from local disk.
+
+STORAGE_BACKEND=local (default) keeps objects under OBJECT_STORAGE_DIR; STORAGE_BACKEND=s3 uses
+any S3-compatible service through a boto3-style client (S3_ENDPOINT_URL points it at a local
+stand-in such as MinIO or moto).
+"""
+import hashlib
+import os
+import re
+import unicodedata
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterator, NamedTuple, Optional
+
+OBJECT_STORAGE_DIR = Path(os.getenv("OBJECT_STORAGE_DIR", "./storage"))
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")
+S3_BUCKET = os.getenv("S3_BUCKET", "documents")
+S3_PREFIX = os.getenv("S3_PREFIX", "")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")
+
+MAX_FILENAME_LENGTH = 120
+UNSAFE_FILENAME_CHARS = re.compile(r"[^A-Za-z0-9._-]+")
+
+
+class ObjectInfo(NamedTuple):
+    size: int
+    etag: str
+    last_modified: float
+
+
+def sanitize_filename(filename: str) -> str:
+    """Strips directories, accents and anything outside [A-Za-z0-9._-] from a client filename."""
+    name = filename.replace("\\", "/").rsplit("/", 1)[-1]
+    name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii")
+    name = UNSAFE_FILENAME_CHARS.sub("_", name).strip("._")
+    return name[-MAX_FILENAME_LENGTH:] or "document"
+
+
+def object_key(document_id: int, filename: str) -> str:
+    shard = hashlib.sha1(str(document_id).encode()).hexdigest()
+    return f"{shard[:2]}/{shard[2:4]}/{document_id}_{sanitize_filename(filename)}"
+
+
+def legacy_file(key: str) -> Optional[Path]:
+    # Pre-sharding rows stored the path the file was written to, e.g. storage/12_nota.pdf
+    path = Path(key)
+    return path if path.is_file() else None
+
+
+def _file_info(path: Path) -> ObjectInfo:
+    stat = path.stat()
+    return ObjectInfo(stat.st_size, f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"', stat.st_mtime)
+
+
+class LocalStorage:
+    def __init__(self, root: Path):
+        self.root = root
+
+    def put(self, key: str, content: bytes, content_type: Optional[str] = None) -> None:
+        path = self.root / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_name(path.name + ".partial")
+        partial.write_bytes(content)
+        os.replace(partial, path)
+
+    def local_path(self, key: str) -> Optional[Path]:
+        path = self.root / key
+        return path if path.is_file() else legacy_file(key)
+
+    def stat(self, key: str) -> ObjectInfo:
+        path = self.local_path(key)
+        if path is None:
+            raise FileNotFoundError(key)
+        return _file_info(path)
+
+    def read(self, key: str) -> bytes:
+        path = self.local_path(key)
+        if path is None:
+            raise FileNotFoundError(key)
+        return path.read_bytes()
+
+    def iter_range(self, key: str, start: int, end: int, chunk_size: int) -> Iterator[bytes]:
+        with open(self.local_path(key) or self.root / key, "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+
+class S3Storage:
+    def __init__(self, client, bucket: str, prefix: str = ""):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def _missing(self, exc: Exception) -> bool:
+        response = getattr(exc, "response", None) or {}
+        return str(response.get("Error", {}).get("Code")) in {"404", "NoSuchKey", "NotFound"}
+
+    def put(self, key: str, content: bytes, content_type: Optional[str] = None) -> None:
+        extra = {"ContentType": content_type} if content_type else {}
+        self.client.put_object(Bucket=self.bucket, Key=self.prefix + key, Body=content, **extra)
+
+    def local_path(self, key: str) -> Optional[Path]:
+        return legacy_file(key)
+
+    def stat(self, key: str) -> ObjectInfo:
+        legacy = legacy_file(key)
+        if legacy is not None:
+            return _file_info(legacy)
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self.prefix + key)
+        except Exception as exc:
+            if self._missing(exc):
+                raise FileNotFoundError(key) from exc
+            raise
+        return ObjectInfo(head["ContentLength"], head["ETag"], head["LastModified"].timestamp())
+
+    def read(self, key: str) -> bytes:
+        legacy = legacy_file(key)
+        if legacy is not None:
+            return legacy.read_bytes()
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self.prefix + key)["Body"].read()
+        except Exception as exc:
+            if self._missing(exc):
+                raise FileNotFoundError(key) from exc
+            raise
+
+    def iter_range(self, key: str, start: int, end: int, chunk_size: int) -> Iterator[bytes]:
+        response = self.client.get_object(Bucket=self.bucket, Key=self.prefix + key, Range=f"bytes={start}-{end}")
+        body = response["Body"]
+        try:
+            yield from body.iter_chunks(chunk_size)
+        finally:
+            body.close()
+
+
+@lru_cache(maxsize=None)
+def get_storage():
+    if STORAGE_BACKEND == "s3":
+        # Optional dependency, only needed for the S3 backend
+        import boto3
+
+        return S3Storage(boto3.client("s3", endpoint_url=S3_ENDPOINT_URL), S3_BUCKET, S3_PREFIX)
+    return LocalStorage(OBJECT_STORAGE_DIR)
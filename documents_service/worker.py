@@ -6,16 +6,21 @@ from typing import Tuple
 
 from celery import Celery
 
-from .database import SessionLocal, init_db
-from .models import Document, Event, Transaction
+from shared.database import SessionLocal, init_db
+from shared.models import Document, Event, LimitSnapshot, Transaction
+
+from .storage import get_storage
 
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", CELERY_BROKER_URL)
+CELERY_TASK_ALWAYS_EAGER = os.getenv("CELERY_TASK_ALWAYS_EAGER", "false").lower() == "true"
 
 celery_app = Celery("documents_worker", broker=CELERY_BROKER_URL, backend=CELERY_RESULT_BACKEND)
+# Runs tasks inline without a broker (benchmarks, local demos)
+celery_app.conf.task_always_eager = CELERY_TASK_ALWAYS_EAGER
 
 
-def _stub_ocr_extract(file_path: str, filename: str) -> Tuple[float, datetime.date, str]:
+def _stub_ocr_extract(storage_key: str, filename: str) -> Tuple[float, datetime.date, str]:
     """
     Minimal OCR stub. It inspects the file content (text) to find an amount and date, otherwise
     falls back to sensible defaults for demo purposes.
@@ -25,8 +30,7 @@ def _stub_ocr_extract(file_path: str, filename: str) -> Tuple[float, datetime.da
     today = datetime.date.today()
 
     try:
-        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-            content = f.read()
+        content = get_storage().read(storage_key).decode("utf-8", errors="ignore")
     except FileNotFoundError:
         return 0.0, today, description
 
@@ -56,6 +60,7 @@ def _stub_ocr_extract(file_path: str, filename: str) -> Tuple[float, datetime.da
 
 @celery_app.task(name="documents.process_document")
 def process_document(document_id: int):
+    # Only the first task in a worker process creates the schema; later calls return immediately
     init_db()
     session = SessionLocal()
 
@@ -80,6 +85,9 @@ def process_document(document_id: int):
             transaction.amount = amount
             transaction.transaction_date = transaction_date
             transaction.description = description
+            # In-place updates sit below the snapshot watermark, so drop the user's snapshot and let
+            # /limits/summary compute live until the next nightly run
+            session.query(LimitSnapshot).filter(LimitSnapshot.user_id == document.user_id).delete()
         else:
             transaction = Transaction(
                 user_id=document.user_id,
@@ -0,0 +1,139 @@
+"""
+Annual revenue report (DASN-SIMEI) export.
+
+Transactions of a year are read in user/date order through a server-side cursor (`yield_per`)
+and turned into a stream of records: every transaction, a subtotal when a month closes and a
+yearly total when a user closes. Records are serialized to CSV or JSON lines in small text chunks,
+so memory stays flat whatever the number of rows.
+"""
+import csv
+import datetime
+import io
+import json
+from typing import Dict, Iterator, Optional
+
+from sqlalchemy import select
+
+from shared.database import ReadSessionLocal
+from shared.models import Transaction
+
+from .forecast import MEI_ANNUAL_LIMIT
+
+YIELD_PER = 2000
+RECORDS_PER_CHUNK = 500
+CSV_COLUMNS = [
+    "record_type", "user_id", "month", "transaction_id", "transaction_date", "description",
+    "document_id", "amount", "transactions", "limit_remaining",
+]
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "jsonl": "application/x-ndjson"}
+
+
+def _subtotal(user_id: int, month: int, revenue: float, count: int) -> Dict[str, object]:
+    return {
+        "record_type": "month_subtotal",
+        "user_id": user_id,
+        "month": month,
+        "amount": round(revenue, 2),
+        "transactions": count,
+    }
+
+
+def _total(user_id: int, revenue: float, count: int) -> Dict[str, object]:
+    return {
+        "record_type": "year_total",
+        "user_id": user_id,
+        "amount": round(revenue, 2),
+        "transactions": count,
+        "limit_remaining": round(max(0.0, MEI_ANNUAL_LIMIT - revenue), 2),
+    }
+
+
+def iter_report_records(year: int, user_id: Optional[int] = None) -> Iterator[Dict[str, object]]:
+    """Opens its own session: it runs while the response streams, after request dependencies close."""
+    query = (
+        select(
+            Transaction.user_id,
+            Transaction.id,
+            Transaction.transaction_date,
+            Transaction.description,
+            Transaction.document_id,
+            Transaction.amount,
+        )
+        .where(
+            Transaction.transaction_date >= datetime.date(year, 1, 1),
+            Transaction.transaction_date < datetime.date(year + 1, 1, 1),
+        )
+        .order_by(Transaction.user_id, Transaction.transaction_date, Transaction.id)
+        .execution_options(yield_per=YIELD_PER)
+    )
+    if user_id is not None:
+        query = query.where(Transaction.user_id == user_id)
+
+    session = ReadSessionLocal()
+    try:
+        current_user = current_month = None
+        month_revenue = year_revenue = 0.0
+        month_count = year_count = 0
+
+        for row in session.execute(query):
+            month = row.transaction_date.month
+            if row.user_id != current_user or month != current_month:
+                if current_user is not None:
+                    yield _subtotal(current_user, current_month, month_revenue, month_count)
+                if row.user_id != current_user:
+                    if current_user is not None:
+                        yield _total(current_user, year_revenue, year_count)
+                    current_user, year_revenue, year_count = row.user_id, 0.0, 0
+                current_month, month_revenue, month_count = month, 0.0, 0
+
+            month_revenue += row.amount
+            year_revenue += row.amount
+            month_count += 1
+            year_count += 1
+            yield {
+                "record_type": "transaction",
+                "user_id": row.user_id,
+                "month": month,
+                "transaction_id": row.id,
+                "transaction_date": row.transaction_date.isoformat(),
+                "description": row.description,
+                "document_id": row.document_id,
+                "amount": row.amount,
+            }
+
+        if current_user is not None:
+            yield _subtotal(current_user, current_month, month_revenue, month_count)
+            yield _total(current_user, year_revenue, year_count)
+        elif user_id is not None:
+            yield _total(user_id, 0.0, 0)
+    finally:
+        session.close()
+
+
+def iter_csv(records: Iterator[Dict[str, object]]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, extrasaction="ignore")
+    writer.writeheader()
+    for position, record in enumerate(records, start=1):
+        writer.writerow(record)
+        if position % RECORDS_PER_CHUNK == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_jsonl(records: Iterator[Dict[str, object]]) -> Iterator[str]:
+    lines = []
+    for record in records:
+        lines.append(json.dumps(record, ensure_ascii=False))
+        if len(lines) == RECORDS_PER_CHUNK:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def iter_report(year: int, file_format: str, user_id: Optional[int] = None) -> Iterator[str]:
+    records = iter_report_records(year, user_id)
+    return iter_csv(records) if file_format == "csv" else iter_jsonl(records)
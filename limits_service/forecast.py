@@ -0,0 +1,167 @@
+"""
+MEI limit forecasting for every user at once.
+
+    python -m limits_service.forecast
+
+Monthly revenue for the previous and current year is loaded with a single GROUP BY into a
+users x 24 matrix. Projections for the remaining months are then computed with array operations
+over all users: run-rate, deseasonalised level, seasonal index and the first month whose
+cumulative revenue exceeds the limit. Results replace the year's rows in `limit_forecasts`.
+"""
+import datetime
+import json
+import time
+from itertools import chain
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+from sqlalchemy import delete, extract, func, insert, select
+from sqlalchemy.engine import Connection
+
+from shared.models import LimitForecast, Transaction
+
+MEI_ANNUAL_LIMIT = 81000.0
+RUN_RATE_MONTHS = 3
+# Bounds for seasonal indexes so one empty or exceptional month last year cannot blow up the level
+SEASONAL_INDEX_BOUNDS = (0.5, 2.0)
+WRITE_CHUNK_SIZE = 10_000
+
+MONTH_LABELS = [
+    "janeiro", "fevereiro", "março", "abril", "maio", "junho",
+    "julho", "agosto", "setembro", "outubro", "novembro", "dezembro",
+]
+
+
+def load_monthly_series(
+    connection: Connection, year: int, user_ids: Optional[Iterable[int]] = None
+) -> Dict[str, np.ndarray]:
+    """Revenue per user and month for `year - 1` and `year`, as a dense (users, 24) matrix."""
+    # One integer key per calendar month keeps the GROUP BY to two columns on every backend
+    month_key = extract("year", Transaction.transaction_date) * 12 + extract("month", Transaction.transaction_date)
+    query = (
+        select(Transaction.user_id, month_key, func.sum(Transaction.amount))
+        .where(
+            Transaction.transaction_date >= datetime.date(year - 1, 1, 1),
+            Transaction.transaction_date < datetime.date(year + 1, 1, 1),
+        )
+        .group_by(Transaction.user_id, month_key)
+    )
+    if user_ids is not None:
+        query = query.where(Transaction.user_id.in_(list(user_ids)))
+
+    rows = connection.execute(query).all()
+    # fromiter over the flattened rows is orders of magnitude faster than np.array(list_of_rows)
+    flat = np.fromiter(chain.from_iterable(rows), dtype=np.float64, count=len(rows) * 3).reshape(-1, 3)
+    users, inverse = np.unique(flat[:, 0].astype(np.int64), return_inverse=True)
+    columns = (flat[:, 1] - ((year - 1) * 12 + 1)).astype(np.int64)
+
+    series = np.zeros((len(users), 24))
+    series[inverse.reshape(-1), columns] = flat[:, 2]
+    return {"user_ids": users, "series": series}
+
+
+def compute_forecasts(series: np.ndarray, current_month: int, limit: float = MEI_ANNUAL_LIMIT) -> Dict[str, np.ndarray]:
+    """
+    `series` holds last year's months in columns 0-11 and this year's in 12-23; `current_month`
+    (1-12) is the month in progress, which counts as the larger of its actual and projected revenue.
+    """
+    prior, current = series[:, :12], series[:, 12:]
+    cm = current_month - 1
+
+    # Seasonal index: each user's own shape from last year, shrunk toward the population shape
+    # by how many of last year's months the user actually invoiced
+    population = prior.sum(axis=0)
+    global_index = population * 12 / population.sum() if population.sum() > 0 else np.ones(12)
+    prior_total = prior.sum(axis=1, keepdims=True)
+    user_index = np.divide(prior * 12, prior_total, out=np.ones_like(prior), where=prior_total > 0)
+    weight = (prior > 0).sum(axis=1, keepdims=True) / 12
+    seasonal = np.clip(weight * user_index + (1 - weight) * global_index, *SEASONAL_INDEX_BOUNDS)
+
+    window = slice(12 + cm - RUN_RATE_MONTHS, 12 + cm)
+    window_months = np.arange(12 + cm - RUN_RATE_MONTHS, 12 + cm) % 12
+    run_rate = series[:, window].mean(axis=1)
+    level = series[:, window].sum(axis=1) / seasonal[:, window_months].sum(axis=1)
+
+    projected = level[:, None] * seasonal[:, cm:]
+    projected[:, 0] = np.maximum(projected[:, 0], current[:, cm])
+    full_year = np.concatenate([current[:, :cm], projected], axis=1)
+    cumulative = np.cumsum(full_year, axis=1)
+
+    breached = cumulative > limit
+    breach_month = np.where(breached.any(axis=1), breached.argmax(axis=1) + 1, 0)
+
+    return {
+        "revenue_ytd": current[:, : cm + 1].sum(axis=1),
+        "run_rate": run_rate,
+        "projected_revenue_year": cumulative[:, -1],
+        "breach_month": breach_month,
+    }
+
+
+def forecast_rows(user_ids: np.ndarray, forecasts: Dict[str, np.ndarray], year: int, computed_at: datetime.datetime):
+    columns = zip(
+        user_ids.tolist(),
+        np.round(forecasts["revenue_ytd"], 2).tolist(),
+        np.round(forecasts["run_rate"], 2).tolist(),
+        np.round(forecasts["projected_revenue_year"], 2).tolist(),
+        forecasts["breach_month"].tolist(),
+    )
+    for user_id, revenue_ytd, run_rate, projected, breach_month in columns:
+        yield {
+            "user_id": user_id,
+            "year": year,
+            "revenue_ytd": revenue_ytd,
+            "run_rate": run_rate,
+            "projected_revenue_year": projected,
+            "breach_month": breach_month or None,
+            "computed_at": computed_at,
+        }
+
+
+def run_forecast(engine, as_of: Optional[datetime.date] = None) -> Dict[str, object]:
+    as_of = as_of or datetime.date.today()
+    computed_at = datetime.datetime.utcnow()
+    started = time.perf_counter()
+
+    with engine.connect() as connection:
+        loaded = load_monthly_series(connection, as_of.year)
+    loaded_at = time.perf_counter()
+    forecasts = compute_forecasts(loaded["series"], as_of.month)
+    computed = time.perf_counter()
+
+    rows = list(forecast_rows(loaded["user_ids"], forecasts, as_of.year, computed_at))
+    with engine.begin() as connection:
+        connection.execute(delete(LimitForecast).where(LimitForecast.year == as_of.year))
+        for offset in range(0, len(rows), WRITE_CHUNK_SIZE):
+            connection.execute(insert(LimitForecast), rows[offset : offset + WRITE_CHUNK_SIZE])
+
+    return {
+        "year": as_of.year,
+        "users": len(rows),
+        "projected_breaches": int((forecasts["breach_month"] > 0).sum()),
+        "seconds": {
+            "load": round(loaded_at - started, 3),
+            "compute": round(computed - loaded_at, 3),
+            "write": round(time.perf_counter() - computed, 3),
+        },
+    }
+
+
+def forecast_for_user(connection: Connection, user_id: int, as_of: datetime.date) -> Optional[Dict[str, object]]:
+    """Live single-user forecast for users the last batch run has not covered yet."""
+    loaded = load_monthly_series(connection, as_of.year, user_ids=[user_id])
+    if not len(loaded["user_ids"]):
+        return None
+    forecasts = compute_forecasts(loaded["series"], as_of.month)
+    return next(forecast_rows(loaded["user_ids"], forecasts, as_of.year, datetime.datetime.utcnow()))
+
+
+def main() -> None:
+    from shared.database import engine, init_db
+
+    init_db()
+    print(json.dumps(run_forecast(engine), indent=2))
+
+
+if __name__ == "__main__":
+    main()
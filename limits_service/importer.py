@@ -0,0 +1,283 @@
+"""
+Bulk import of historical invoicing into `transactions`.
+
+    python -m limits_service.importer notas_2023.csv --user-id 1
+    python -m limits_service.importer extrato.ofx --user-id 1 --format ofx
+
+Rows are parsed lazily from the stream, validated and written in batches, so memory stays bounded
+by the batch size whatever the file size. SQLite gets one executemany per batch and Postgres
+(psycopg2) one COPY per batch. Each batch also records a single `transactions_imported` event with
+the per-user monthly subtotals it added, instead of one event per row.
+"""
+import argparse
+import csv
+import datetime
+import io
+import json
+import math
+import re
+import time
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from sqlalchemy.engine import Connection
+
+from shared.models import Event, Transaction
+
+DEFAULT_BATCH_SIZE = 10_000
+MAX_REPORTED_ERRORS = 50
+
+CSV_COLUMNS = {
+    "date": {"date", "data", "transaction_date", "data_emissao", "emissao"},
+    "amount": {"amount", "valor", "valor_total", "total"},
+    "description": {"description", "descricao", "descrição", "historico", "histórico", "servico", "serviço"},
+    "user_id": {"user_id", "usuario", "usuário"},
+}
+TRANSACTION_COLUMNS = ("user_id", "document_id", "amount", "transaction_date", "description", "created_at")
+
+# raw row: (line number, user_id, date, amount, description) before validation
+RawRow = Tuple[int, Optional[str], str, str, str]
+
+
+class ImportErrorRow(ValueError):
+    pass
+
+
+DOTTED_THOUSANDS = re.compile(r"-?\d{1,3}(?:\.\d{3})+")
+
+
+def parse_amount(value: str) -> float:
+    """
+    Accepts 1234.56, 1.234,56, 1,234.56, R$ 1.234,56 and -50,00; the last separator is the decimal one.
+    Dots alone followed by groups of exactly three digits (1.500, 1.500.000) are thousands separators.
+    """
+    cleaned = value.strip().replace("R$", "").replace(" ", "")
+    if DOTTED_THOUSANDS.fullmatch(cleaned):
+        cleaned = cleaned.replace(".", "")
+    elif cleaned.rfind(",") > cleaned.rfind("."):
+        cleaned = cleaned.replace(".", "").replace(",", ".")
+    else:
+        cleaned = cleaned.replace(",", "")
+    try:
+        amount = float(Decimal(cleaned))
+    except InvalidOperation as exc:
+        raise ImportErrorRow(f"valor inválido: {value!r}") from exc
+    # Decimal parses NaN and Infinity, which the database and JSON responses cannot hold
+    if not math.isfinite(amount):
+        raise ImportErrorRow(f"valor inválido: {value!r}")
+    return amount
+
+
+def parse_date(value: str) -> datetime.date:
+    """Accepts YYYY-MM-DD, DD/MM/YYYY and OFX YYYYMMDD[HHMMSS...]."""
+    value = value.strip()
+    try:
+        if "/" in value:
+            day, month, year = value.split("/")
+            return datetime.date(int(year), int(month), int(day))
+        if "-" in value:
+            return datetime.date.fromisoformat(value[:10])
+        return datetime.date(int(value[:4]), int(value[4:6]), int(value[6:8]))
+    except ValueError as exc:
+        raise ImportErrorRow(f"data inválida: {value!r}") from exc
+
+
+def _normalize_header(name: str) -> str:
+    return name.strip().lower().replace(" ", "_")
+
+
+def iter_csv_rows(stream: TextIO) -> Iterator[RawRow]:
+    header_line = stream.readline()
+    delimiter = ";" if header_line.count(";") > header_line.count(",") else ","
+    header = [_normalize_header(name) for name in next(csv.reader([header_line], delimiter=delimiter))]
+
+    positions: Dict[str, int] = {}
+    for field, aliases in CSV_COLUMNS.items():
+        for position, name in enumerate(header):
+            if name in aliases:
+                positions[field] = position
+                break
+    missing = {"date", "amount"} - positions.keys()
+    if missing:
+        raise ImportErrorRow(f"colunas obrigatórias ausentes no CSV: {', '.join(sorted(missing))}")
+
+    date_at, amount_at = positions["date"], positions["amount"]
+    description_at, user_at = positions.get("description"), positions.get("user_id")
+
+    for line_number, row in enumerate(csv.reader(stream, delimiter=delimiter), start=2):
+        if not row:
+            continue
+        try:
+            yield (
+                line_number,
+                row[user_at] if user_at is not None else None,
+                row[date_at],
+                row[amount_at],
+                row[description_at] if description_at is not None else "",
+            )
+        except IndexError:
+            yield line_number, None, "", "", ""
+
+
+OFX_TAG = re.compile(r"<(\w+)>([^<\r\n]*)")
+
+
+def iter_ofx_rows(stream: TextIO) -> Iterator[RawRow]:
+    """Yields credit entries (<STMTTRN> with positive TRNAMT) from an OFX 1.x/2.x statement."""
+    current: Optional[Dict[str, str]] = None
+    start_line = 0
+    for line_number, line in enumerate(stream, start=1):
+        for tag, value in OFX_TAG.findall(line):
+            tag = tag.upper()
+            if tag == "STMTTRN":
+                current, start_line = {}, line_number
+            elif current is not None and value:
+                current[tag] = value.strip()
+        if current is not None and "</STMTTRN>" in line.upper():
+            amount = current.get("TRNAMT", "")
+            if not amount.startswith("-"):
+                description = current.get("MEMO") or current.get("NAME") or "Importado via OFX"
+                yield start_line, None, current.get("DTPOSTED", ""), amount, description
+            current = None
+
+
+def validate_batch(
+    raw_rows: Iterable[RawRow],
+    default_user_id: Optional[int],
+    created_at: datetime.datetime,
+) -> Tuple[List[tuple], List[Dict[str, object]]]:
+    valid: List[tuple] = []
+    errors: List[Dict[str, object]] = []
+    for line_number, user_value, date_value, amount_value, description in raw_rows:
+        try:
+            user_id = int(user_value) if user_value else default_user_id
+            if user_id is None:
+                raise ImportErrorRow("user_id ausente")
+            amount = parse_amount(amount_value)
+            if amount <= 0:
+                raise ImportErrorRow(f"valor deve ser positivo: {amount_value!r}")
+            transaction_date = parse_date(date_value)
+        except (ImportErrorRow, ValueError) as exc:
+            errors.append({"line": line_number, "error": str(exc)})
+            continue
+        valid.append((user_id, None, amount, transaction_date, description.strip()[:140] or None, created_at))
+    return valid, errors
+
+
+def _copy_rows(connection: Connection, rows: List[tuple]) -> None:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for user_id, _, amount, transaction_date, description, created_at in rows:
+        writer.writerow([user_id, "", amount, transaction_date.isoformat(), description or "", created_at.isoformat()])
+    buffer.seek(0)
+
+    columns = ", ".join(TRANSACTION_COLUMNS)
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {Transaction.__tablename__} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+
+def write_batch(connection: Connection, rows: List[tuple]) -> None:
+    if connection.dialect.name == "postgresql" and connection.dialect.driver == "psycopg2":
+        _copy_rows(connection, rows)
+        return
+
+    placeholders = ", ".join("?" if connection.dialect.paramstyle == "qmark" else "%s" for _ in TRANSACTION_COLUMNS)
+    connection.exec_driver_sql(
+        f"INSERT INTO {Transaction.__tablename__} ({', '.join(TRANSACTION_COLUMNS)}) VALUES ({placeholders})",
+        rows,
+    )
+
+
+def record_batch_event(connection: Connection, rows: List[tuple], created_at: datetime.datetime) -> None:
+    monthly: Dict[int, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    for user_id, _, amount, transaction_date, _, _ in rows:
+        monthly[user_id][transaction_date.strftime("%Y-%m")] += amount
+
+    payload = {
+        "rows": len(rows),
+        "monthly_totals": {
+            str(user_id): {month: round(total, 2) for month, total in months.items()}
+            for user_id, months in monthly.items()
+        },
+    }
+    connection.execute(
+        Event.__table__.insert(),
+        {"event_type": "transactions_imported", "payload": json.dumps(payload), "created_at": created_at},
+    )
+
+
+def import_transactions(
+    engine,
+    raw_rows: Iterable[RawRow],
+    default_user_id: Optional[int] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Dict[str, object]:
+    started = time.perf_counter()
+    imported = rejected = batches = 0
+    errors: List[Dict[str, object]] = []
+
+    raw_rows = iter(raw_rows)
+    while True:
+        chunk = list(islice(raw_rows, batch_size))
+        if not chunk:
+            break
+        # Stamped per batch: the limits snapshot watermark is a created_at cutoff, so a batch
+        # committed late in a long import must not carry the import's start time
+        created_at = datetime.datetime.utcnow()
+        valid, batch_errors = validate_batch(chunk, default_user_id, created_at)
+        rejected += len(batch_errors)
+        errors.extend(batch_errors[: MAX_REPORTED_ERRORS - len(errors)])
+        if not valid:
+            continue
+
+        # One transaction per batch: a failure leaves earlier batches committed and reported
+        with engine.begin() as connection:
+            write_batch(connection, valid)
+            record_batch_event(connection, valid, created_at)
+        imported += len(valid)
+        batches += 1
+
+    return {
+        "imported": imported,
+        "rejected": rejected,
+        "batches": batches,
+        "errors": errors,
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+def detect_format(filename: str, explicit: Optional[str] = None) -> str:
+    if explicit:
+        return explicit.lower()
+    return "ofx" if filename.lower().endswith((".ofx", ".qfx")) else "csv"
+
+
+def iter_rows(stream: TextIO, file_format: str) -> Iterator[RawRow]:
+    return iter_ofx_rows(stream) if file_format == "ofx" else iter_csv_rows(stream)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--user-id", type=int, help="dono das transações quando o arquivo não tem coluna user_id")
+    parser.add_argument("--format", choices=["csv", "ofx"])
+    parser.add_argument("--encoding", default="utf-8-sig")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    from shared.database import engine, init_db
+
+    init_db()
+    with open(args.path, "r", encoding=args.encoding, newline="") as stream:
+        rows = iter_rows(stream, detect_format(args.path, args.format))
+        result = import_transactions(engine, rows, default_user_id=args.user_id, batch_size=args.batch_size)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
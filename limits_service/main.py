@@ -1,31 +1,26 @@
+import codecs
 import datetime
+import io
 import os
+import secrets
+from typing import Optional
 
-from fastapi import Depends, FastAPI, Query
+from fastapi import Depends, FastAPI, File, Form, Header, HTTPException, Query, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import Column, Date, DateTime, Float, Integer, String, create_engine, func
-from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from fastapi.responses import StreamingResponse
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
 
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./saas.db")
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {},
-)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
-Base = declarative_base()
-
-
-class Transaction(Base):
-    __tablename__ = "transactions"
+from shared.database import engine, get_read_db, init_db
+from shared.models import LimitForecast, LimitSnapshot, Transaction
+from shared.observability import install_observability
 
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, index=True, nullable=False)
-    document_id = Column(Integer, index=True)
-    amount = Column(Float, nullable=False)
-    transaction_date = Column(Date, nullable=False)
-    description = Column(String)
-    created_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+from .export import MEDIA_TYPES, iter_report
+from .forecast import MEI_ANNUAL_LIMIT, MONTH_LABELS, forecast_for_user
+from .importer import DEFAULT_BATCH_SIZE, ImportErrorRow, detect_format, import_transactions, iter_rows
 
+# Required by the all-users export; without it that endpoint is disabled
+LIMITS_ADMIN_TOKEN = os.getenv("LIMITS_ADMIN_TOKEN")
 
 app = FastAPI(title="Limits Service", version="0.2.0")
 
@@ -37,52 +32,62 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+install_observability(app, "limits")
+
 
 @app.on_event("startup")
 def startup_event():
-    Base.metadata.create_all(bind=engine)
-
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+    init_db()
 
 
 @app.get("/limits/summary")
 def limits_summary(
     year: int = Query(..., description="Ano de referência para o MEI"),
     user_id: int = Query(..., description="Identificador do usuário"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     today = datetime.date.today()
     month_start = datetime.date(year=year, month=today.month, day=1)
     next_month = (month_start.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
 
-    revenue_month = (
-        db.query(func.coalesce(func.sum(Transaction.amount), 0))
-        .filter(
-            Transaction.user_id == user_id,
-            Transaction.transaction_date >= month_start,
-            Transaction.transaction_date < next_month,
-        )
-        .scalar()
-    )
-
     year_start = datetime.date(year=year, month=1, day=1)
     year_end = datetime.date(year=year + 1, month=1, day=1)
 
-    revenue_year = (
-        db.query(func.coalesce(func.sum(Transaction.amount), 0))
-        .filter(
-            Transaction.user_id == user_id,
-            Transaction.transaction_date >= year_start,
-            Transaction.transaction_date < year_end,
+    # Nightly snapshot (limits_service.worker) plus whatever was created after its watermark;
+    # users without snapshot rows get no watermark, i.e. the full live computation
+    watermark, snapshot_year, snapshot_month = (
+        db.query(
+            func.max(LimitSnapshot.watermark),
+            func.coalesce(func.sum(case((LimitSnapshot.year == year, LimitSnapshot.revenue), else_=0)), 0),
+            func.coalesce(
+                func.sum(
+                    case(
+                        ((LimitSnapshot.year == year) & (LimitSnapshot.month == month_start.month), LimitSnapshot.revenue),
+                        else_=0,
+                    )
+                ),
+                0,
+            ),
         )
-        .scalar()
+        .filter(LimitSnapshot.user_id == user_id)
+        .one()
+    )
+
+    in_month = (Transaction.transaction_date >= month_start) & (Transaction.transaction_date < next_month)
+    live_query = db.query(
+        func.coalesce(func.sum(Transaction.amount), 0),
+        func.coalesce(func.sum(case((in_month, Transaction.amount), else_=0)), 0),
+    ).filter(
+        Transaction.user_id == user_id,
+        Transaction.transaction_date >= year_start,
+        Transaction.transaction_date < year_end,
     )
+    if watermark is not None:
+        live_query = live_query.filter(Transaction.created_at >= watermark)
+    live_year, live_month = live_query.one()
+
+    revenue_month = snapshot_month + live_month
+    revenue_year = snapshot_year + live_year
 
     limit_remaining = max(0, 81000 - revenue_year)
 
@@ -92,4 +97,92 @@ def limits_summary(
         "revenue_month": float(revenue_month),
         "revenue_year": float(revenue_year),
         "limit_remaining": float(limit_remaining),
+        "snapshot_watermark": watermark.isoformat() if watermark else None,
+    }
+
+
+@app.get("/limits/forecast")
+def limits_forecast(
+    user_id: int = Query(..., description="Identificador do usuário"),
+    db: Session = Depends(get_read_db),
+):
+    today = datetime.date.today()
+    forecast = db.get(LimitForecast, (user_id, today.year))
+    if forecast is not None:
+        source = "batch"
+        row = {column.name: getattr(forecast, column.name) for column in LimitForecast.__table__.columns}
+    else:
+        source = "live"
+        row = forecast_for_user(db.connection(), user_id, today) or {
+            "user_id": user_id,
+            "year": today.year,
+            "revenue_ytd": 0.0,
+            "run_rate": 0.0,
+            "projected_revenue_year": 0.0,
+            "breach_month": None,
+            "computed_at": datetime.datetime.utcnow(),
+        }
+
+    breach_month = row["breach_month"]
+    return {
+        **row,
+        "computed_at": row["computed_at"].isoformat(),
+        "limit": MEI_ANNUAL_LIMIT,
+        "projected_limit_remaining": round(max(0.0, MEI_ANNUAL_LIMIT - row["projected_revenue_year"]), 2),
+        "breach_label": f"{MONTH_LABELS[breach_month - 1]} de {row['year']}" if breach_month else None,
+        "source": source,
     }
+
+
+@app.post("/limits/import")
+def import_history(
+    user_id: Optional[int] = Form(None, description="Dono das linhas quando o arquivo não tem coluna user_id"),
+    file: UploadFile = File(...),
+    format: Optional[str] = Form(None, description="csv ou ofx (default: pela extensão)"),
+    encoding: str = Form("utf-8-sig"),
+    batch_size: int = Form(DEFAULT_BATCH_SIZE, ge=100, le=100_000),
+):
+    file_format = detect_format(file.filename or "", format)
+    if file_format not in {"csv", "ofx"}:
+        raise HTTPException(status_code=400, detail="Formato não suportado; use csv ou ofx")
+    try:
+        codecs.lookup(encoding)
+    except LookupError:
+        raise HTTPException(status_code=400, detail=f"Codificação desconhecida: {encoding}")
+
+    # Sync endpoint: the upload is parsed straight from its spooled temp file in a worker thread
+    stream = io.TextIOWrapper(file.file, encoding=encoding, errors="replace", newline="")
+    try:
+        return import_transactions(engine, iter_rows(stream, file_format), default_user_id=user_id, batch_size=batch_size)
+    except ImportErrorRow as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    finally:
+        stream.detach()
+
+
+def report_response(year: int, file_format: str, filename: str, user_id: Optional[int] = None) -> StreamingResponse:
+    return StreamingResponse(
+        iter_report(year, file_format, user_id),
+        media_type=MEDIA_TYPES[file_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{file_format}"'},
+    )
+
+
+@app.get("/limits/export")
+def export_annual_report(
+    user_id: int = Query(..., description="Identificador do usuário"),
+    year: int = Query(..., ge=1, le=9998, description="Ano-calendário da declaração"),
+    format: str = Query("csv", pattern="^(csv|jsonl)$"),
+):
+    return report_response(year, format, f"faturamento_{user_id}_{year}", user_id)
+
+
+@app.get("/limits/export/all")
+def export_all_annual_reports(
+    year: int = Query(..., ge=1, le=9998, description="Ano-calendário da declaração"),
+    format: str = Query("csv", pattern="^(csv|jsonl)$"),
+    x_admin_token: Optional[str] = Header(None),
+):
+    if not LIMITS_ADMIN_TOKEN or not x_admin_token or not secrets.compare_digest(x_admin_token, LIMITS_ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+    return report_response(year, format, f"faturamento_{year}")
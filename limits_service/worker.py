@@ -0,0 +1,130 @@
+"""
+Nightly limits recomputation.
+
+    celery -A limits_service.worker.celery_app worker -l info
+    celery -A limits_service.worker.celery_app beat -l info
+    python -m limits_service.worker   # one inline run, no broker
+
+`limits.recompute_snapshots` fixes a watermark (a `created_at` cutoff) and fans out one
+`limits.recompute_snapshot_chunk` per user_id range, so chunks run in parallel across workers. Each
+chunk replaces its users' rows in `limits_snapshots` with a single INSERT ... SELECT ... GROUP BY.
+
+The watermark trails the clock by LIMITS_SNAPSHOT_LAG_SECONDS. Ids are not commit-ordered on
+Postgres (a sequence value is taken before commit), so an id watermark could skip a row that
+commits late; a cutoff in the past only misses rows whose writing transaction stays open longer
+than the lag, and it also absorbs clock skew between the API hosts and the worker.
+"""
+import datetime
+import json
+import os
+from typing import Dict, Iterator, Tuple
+
+from celery import Celery, group
+from celery.schedules import crontab
+from sqlalchemy import delete, extract, func, insert, literal, select
+from sqlalchemy.engine import Connection
+
+from shared.database import engine, init_db
+from shared.models import LimitSnapshot, Transaction
+
+from .forecast import run_forecast
+
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
+CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", CELERY_BROKER_URL)
+CELERY_TASK_ALWAYS_EAGER = os.getenv("CELERY_TASK_ALWAYS_EAGER", "false").lower() == "true"
+LIMITS_SNAPSHOT_HOUR = int(os.getenv("LIMITS_SNAPSHOT_HOUR", "3"))
+LIMITS_SNAPSHOT_CHUNK_USERS = int(os.getenv("LIMITS_SNAPSHOT_CHUNK_USERS", "5000"))
+LIMITS_SNAPSHOT_LAG_SECONDS = int(os.getenv("LIMITS_SNAPSHOT_LAG_SECONDS", "900"))
+
+celery_app = Celery("limits_worker", broker=CELERY_BROKER_URL, backend=CELERY_RESULT_BACKEND)
+celery_app.conf.task_always_eager = CELERY_TASK_ALWAYS_EAGER
+celery_app.conf.beat_schedule = {
+    "limits-nightly-snapshots": {
+        "task": "limits.recompute_snapshots",
+        "schedule": crontab(hour=LIMITS_SNAPSHOT_HOUR, minute=0),
+    },
+    "limits-nightly-forecast": {
+        "task": "limits.run_forecast",
+        "schedule": crontab(hour=LIMITS_SNAPSHOT_HOUR, minute=30),
+    },
+}
+
+
+def current_watermark(lag_seconds: int = LIMITS_SNAPSHOT_LAG_SECONDS) -> datetime.datetime:
+    return datetime.datetime.utcnow() - datetime.timedelta(seconds=lag_seconds)
+
+
+def user_id_ranges(connection: Connection, chunk_users: int) -> Iterator[Tuple[int, int]]:
+    """Inclusive user_id ranges covering every user with transactions."""
+    low, high = connection.execute(select(func.min(Transaction.user_id), func.max(Transaction.user_id))).one()
+    if low is None:
+        return
+    for start in range(low, high + 1, chunk_users):
+        yield start, min(start + chunk_users - 1, high)
+
+
+def recompute_chunk(connection: Connection, first_user: int, last_user: int, watermark: datetime.datetime) -> int:
+    transaction_year = extract("year", Transaction.transaction_date)
+    transaction_month = extract("month", Transaction.transaction_date)
+    monthly = (
+        select(
+            Transaction.user_id,
+            transaction_year,
+            transaction_month,
+            func.sum(Transaction.amount),
+            literal(watermark),
+            literal(datetime.datetime.utcnow()),
+        )
+        .where(Transaction.user_id.between(first_user, last_user), Transaction.created_at < watermark)
+        .group_by(Transaction.user_id, transaction_year, transaction_month)
+    )
+
+    connection.execute(delete(LimitSnapshot).where(LimitSnapshot.user_id.between(first_user, last_user)))
+    result = connection.execute(
+        insert(LimitSnapshot).from_select(
+            ["user_id", "year", "month", "revenue", "watermark", "computed_at"], monthly
+        )
+    )
+    return result.rowcount
+
+
+@celery_app.task(name="limits.recompute_snapshot_chunk")
+def recompute_snapshot_chunk(first_user: int, last_user: int, watermark: str) -> Dict[str, int]:
+    with engine.begin() as connection:
+        rows = recompute_chunk(connection, first_user, last_user, datetime.datetime.fromisoformat(watermark))
+    return {"first_user": first_user, "last_user": last_user, "rows": rows}
+
+
+@celery_app.task(name="limits.recompute_snapshots")
+def recompute_snapshots(chunk_users: int = LIMITS_SNAPSHOT_CHUNK_USERS) -> Dict[str, object]:
+    init_db()
+    # Sent as ISO text: every chunk must use exactly the same cutoff whatever the task serializer
+    watermark = current_watermark().isoformat()
+    with engine.connect() as connection:
+        ranges = list(user_id_ranges(connection, chunk_users))
+
+    group(recompute_snapshot_chunk.s(first, last, watermark) for first, last in ranges).apply_async()
+    return {"watermark": watermark, "chunks": len(ranges)}
+
+
+@celery_app.task(name="limits.run_forecast")
+def run_forecast_task() -> Dict[str, object]:
+    init_db()
+    return run_forecast(engine)
+
+
+def main() -> None:
+    init_db()
+    started = datetime.datetime.utcnow()
+    with engine.begin() as connection:
+        watermark = current_watermark()
+        rows = sum(
+            recompute_chunk(connection, first, last, watermark)
+            for first, last in user_id_ranges(connection, LIMITS_SNAPSHOT_CHUNK_USERS)
+        )
+    seconds = (datetime.datetime.utcnow() - started).total_seconds()
+    print(json.dumps({"watermark": watermark.isoformat(), "rows": rows, "seconds": round(seconds, 2)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
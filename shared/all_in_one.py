@@ -0,0 +1,76 @@
+"""
+Single-process deployment: every service behind one ASGI app.
+
+    uvicorn shared.all_in_one:app --port 8000
+
+Requests are dispatched by path prefix. `/auth/...` goes to auth-service with the prefix stripped
+(its routes are `/login`, `/register`, ...), `/documents`, `/limits` and `/billing` go to their
+services unchanged, and everything else, `/assistant` included, goes to the api-gateway, which
+authenticates and rate limits it before proxying. Each service is imported and started on its
+first request, or at startup with ALL_IN_ONE_PRELOAD=true. Gateway -> limits, gateway -> assistant
+and assistant -> billing calls are served in-process.
+"""
+import os
+
+import anyio
+
+from .service_client import enable_in_process_calls
+from .services import SERVICES, start_service, stop_services
+
+ALL_IN_ONE_PRELOAD = os.getenv("ALL_IN_ONE_PRELOAD", "false").lower() == "true"
+
+# prefix -> (service, strip prefix)
+PREFIXES = {
+    "/auth": ("auth", True),
+    "/documents": ("documents", False),
+    "/limits": ("limits", False),
+    "/billing": ("billing", False),
+}
+DEFAULT_SERVICE = "gateway"
+
+
+def resolve(path: str):
+    prefix = "/" + path.split("/", 2)[1] if path.startswith("/") else ""
+    service, strip = PREFIXES.get(prefix, (DEFAULT_SERVICE, False))
+    return service, prefix if strip else ""
+
+
+class AllInOneApp:
+    def __init__(self):
+        self.apps = {}
+
+    async def app_for(self, service: str):
+        app = self.apps.get(service)
+        if app is None:
+            # Import and startup block, so they run off the event loop
+            app = await anyio.to_thread.run_sync(start_service, service)
+            self.apps[service] = app
+        return app
+
+    async def lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                if ALL_IN_ONE_PRELOAD:
+                    for service in SERVICES:
+                        await self.app_for(service)
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await anyio.to_thread.run_sync(stop_services)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+            return
+
+        service, mount = resolve(scope["path"])
+        if mount:
+            # ASGI mount semantics: path stays whole, root_path grows by the mounted prefix
+            scope = dict(scope, root_path=scope.get("root_path", "") + mount)
+        await (await self.app_for(service))(scope, receive, send)
+
+
+enable_in_process_calls()
+app = AllInOneApp()
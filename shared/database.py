@@ -0,0 +1,99 @@
+import os
+from typing import Optional, Set
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from .observability import instrument_engine
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./saas.db")
+# Optional replica (Postgres) or separate read-only URL; reads fall back to the primary when unset
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL")
+
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+
+def _sqlite_pragmas(read_only: bool):
+    def apply(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # WAL lets readers proceed while the worker writes; busy_timeout makes writers wait for
+        # the lock instead of failing with "database is locked"
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+    return apply
+
+
+def create_tuned_engine(url: str, read_only: bool = False) -> Engine:
+    if url.startswith("sqlite"):
+        engine = create_engine(
+            url,
+            connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+        )
+        event.listen(engine, "connect", _sqlite_pragmas(read_only))
+        return engine
+
+    return create_engine(
+        url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+    )
+
+
+engine = create_tuned_engine(DATABASE_URL)
+read_engine: Engine = create_tuned_engine(DATABASE_READ_URL, read_only=True) if DATABASE_READ_URL else engine
+instrument_engine(engine)
+instrument_engine(read_engine)
+
+SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+ReadSessionLocal = sessionmaker(bind=read_engine, autoflush=False, autocommit=False)
+Base = declarative_base()
+_initialized_binds: Set[Engine] = set()
+
+
+def init_db(bind: Optional[Engine] = None):
+    """Creates missing tables and indexes once per engine; later calls in the same process are free."""
+    # Import models to ensure tables are registered
+    from . import models  # noqa: F401
+
+    bind = bind or engine
+    if bind in _initialized_binds:
+        return
+    Base.metadata.create_all(bind=bind)
+    # create_all skips indexes of tables that already exist, so add any new ones explicitly
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+    _initialized_binds.add(bind)
+
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,98 @@
+import datetime
+
+from sqlalchemy import Column, Date, DateTime, Float, ForeignKey, Index, Integer, String, Text
+from sqlalchemy.orm import relationship
+
+from .database import Base
+
+
+class Document(Base):
+    __tablename__ = "documents"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, index=True, nullable=False)
+    filename = Column(String, nullable=False)
+    storage_path = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="pending")
+    uploaded_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+    processed_at = Column(DateTime)
+    total_value = Column(Float)
+    transaction_date = Column(Date)
+    description = Column(String)
+
+    transaction = relationship("Transaction", back_populates="document", uselist=False)
+
+
+class Transaction(Base):
+    __tablename__ = "transactions"
+    __table_args__ = (
+        Index("ix_transactions_user_date", "user_id", "transaction_date"),
+        # Serves the live part of /limits/summary: a user's rows created after the snapshot watermark
+        Index("ix_transactions_user_created", "user_id", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, index=True, nullable=False)
+    document_id = Column(Integer, ForeignKey("documents.id"), index=True, nullable=True)
+    amount = Column(Float, nullable=False)
+    transaction_date = Column(Date, nullable=False)
+    description = Column(String)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+
+    document = relationship("Document", back_populates="transaction")
+
+
+class Event(Base):
+    __tablename__ = "events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    event_type = Column(String, nullable=False)
+    payload = Column(Text)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+
+
+class LimitSnapshot(Base):
+    __tablename__ = "limits_snapshots"
+
+    user_id = Column(Integer, primary_key=True)
+    year = Column(Integer, primary_key=True)
+    month = Column(Integer, primary_key=True)
+    revenue = Column(Float, nullable=False)
+    # Transactions created before this instant are included; later ones are merged in at read time
+    watermark = Column(DateTime, nullable=False)
+    computed_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+
+
+class LimitForecast(Base):
+    __tablename__ = "limit_forecasts"
+
+    user_id = Column(Integer, primary_key=True)
+    year = Column(Integer, primary_key=True)
+    revenue_ytd = Column(Float, nullable=False)
+    run_rate = Column(Float, nullable=False)
+    projected_revenue_year = Column(Float, nullable=False)
+    breach_month = Column(Integer)
+    computed_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+
+
+class Plan(Base):
+    __tablename__ = "plans"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, nullable=False)
+    token_limit = Column(Integer, default=5000)
+    monthly_price = Column(Float, default=0.0)
+
+
+class Usage(Base):
+    __tablename__ = "usages"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, index=True, nullable=False)
+    plan_id = Column(Integer, ForeignKey("plans.id"), nullable=False)
+    period_start = Column(Date, index=True, nullable=False)
+    tokens_used = Column(Integer, default=0)
+    uploads = Column(Integer, default=0)
+    api_calls = Column(Integer, default=0)
+
+    plan = relationship("Plan")
@@ -0,0 +1,211 @@
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
+
+REQUEST_ID_HEADER = "X-Request-ID"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+service_var: ContextVar[str] = ContextVar("service", default="background")
+# [query_count, query_seconds] of the request being served; mutated from the threadpool
+request_db_stats_var: ContextVar[Optional[List[float]]] = ContextVar("request_db_stats", default=None)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {value:g}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[LabelValues, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = [0.0] * (len(self.buckets) + 2)
+                self._values[labels] = state
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[position] += 1
+                    break
+            else:
+                state[len(self.buckets)] += 1
+            state[-1] += value
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = [(labels, list(state)) for labels, state in self._values.items()]
+        for labels, state in values:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                bucket_labels = _format_labels(self.labelnames, labels, f'le="{bound:g}"')
+                yield f"{self.name}_bucket{bucket_labels} {cumulative:g}"
+            cumulative += state[len(self.buckets)]
+            bucket_labels = _format_labels(self.labelnames, labels, 'le="+Inf"')
+            yield f"{self.name}_bucket{bucket_labels} {cumulative:g}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {state[-1]:g}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative:g}"
+
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests served.", ("service", "method", "route", "status")
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency until the response starts.", ("service", "method", "route")
+)
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being served.", ("service",))
+HTTP_DB_QUERIES = Counter(
+    "http_request_db_queries_total", "DB queries issued while serving HTTP requests.", ("service", "method", "route")
+)
+DB_QUERIES = Counter("db_queries_total", "DB queries executed.", ("service",))
+DB_LATENCY = Histogram("db_query_duration_seconds", "DB query execution time.", ("service",))
+
+REGISTRY = [HTTP_REQUESTS, HTTP_LATENCY, HTTP_IN_FLIGHT, HTTP_DB_QUERIES, DB_QUERIES, DB_LATENCY]
+
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+def outbound_headers() -> Dict[str, str]:
+    """Headers to attach to inter-service calls so the current request can be traced downstream."""
+    request_id = request_id_var.get()
+    return {REQUEST_ID_HEADER: request_id} if request_id else {}
+
+
+_instrumented_engines = set()
+
+
+def instrument_engine(engine) -> None:
+    # Imported lazily so the api-gateway, which has no database, does not need SQLAlchemy
+    from sqlalchemy import event
+
+    if id(engine) in _instrumented_engines:
+        return
+    _instrumented_engines.add(id(engine))
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started_at"].pop()
+        service = service_var.get()
+        DB_QUERIES.inc(service)
+        DB_LATENCY.observe(elapsed, service)
+
+        stats = request_db_stats_var.get()
+        if stats is not None:
+            stats[0] += 1
+            stats[1] += elapsed
+
+
+def _route_label(request: Request) -> str:
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def install_observability(app: FastAPI, service: str) -> None:
+    """
+    Adds X-Request-ID propagation, per-route latency/in-flight/DB metrics and a Prometheus
+    `/metrics` endpoint. Install it after the service's own middlewares so it wraps them.
+    """
+
+    @app.middleware("http")
+    async def observability_middleware(request: Request, call_next):
+        request_id = request.headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex
+        request.state.request_id = request_id
+        tokens = (
+            request_id_var.set(request_id),
+            service_var.set(service),
+            request_db_stats_var.set([0, 0.0]),
+        )
+        stats = request_db_stats_var.get()
+
+        HTTP_IN_FLIGHT.inc(service)
+        started = time.perf_counter()
+        status_code = 500
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+        finally:
+            elapsed = time.perf_counter() - started
+            route = _route_label(request)
+            HTTP_IN_FLIGHT.dec(service)
+            HTTP_REQUESTS.inc(service, request.method, route, str(status_code))
+            HTTP_LATENCY.observe(elapsed, service, request.method, route)
+            HTTP_DB_QUERIES.inc(service, request.method, route, amount=stats[0])
+            for var, token in zip((request_id_var, service_var, request_db_stats_var), tokens):
+                var.reset(token)
+
+        response.headers[REQUEST_ID_HEADER] = request_id
+        return response
+
+    def metrics():
+        return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+    app.add_api_route("/metrics", metrics, methods=["GET"], include_in_schema=False)
@@ -0,0 +1,152 @@
+"""
+Token-bucket rate limiting keyed by user, tiered by plan.
+
+Each user gets a bucket of `burst` tokens refilled at `per_minute / 60` tokens per second; a request
+spends one token. Buckets live in a store: `InMemoryRateLimitStore` (default, per process) or
+`RedisRateLimitStore`, which runs the same bucket update atomically in a Lua script so several
+gateway replicas share limits. Any redis-py compatible asyncio client works, including fakeredis.
+"""
+import math
+import os
+import threading
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_STORE_URL = os.getenv("RATE_LIMIT_STORE_URL", "memory://")
+RATE_LIMIT_DEFAULT_PLAN = os.getenv("RATE_LIMIT_DEFAULT_PLAN", "free").lower()
+
+
+class RateLimitPolicy(NamedTuple):
+    burst: int
+    per_minute: float
+
+    @property
+    def refill_per_second(self) -> float:
+        return self.per_minute / 60
+
+
+class RateLimitDecision(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_seconds: int
+    retry_after: int
+
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            "RateLimit-Limit": str(self.limit),
+            "RateLimit-Remaining": str(self.remaining),
+            "RateLimit-Reset": str(self.reset_seconds),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(self.retry_after)
+        return headers
+
+
+def policies_from_env() -> Dict[str, RateLimitPolicy]:
+    return {
+        "free": RateLimitPolicy(
+            burst=int(os.getenv("RATE_LIMIT_FREE_BURST", "20")),
+            per_minute=float(os.getenv("RATE_LIMIT_FREE_PER_MINUTE", "60")),
+        ),
+        "pro": RateLimitPolicy(
+            burst=int(os.getenv("RATE_LIMIT_PRO_BURST", "100")),
+            per_minute=float(os.getenv("RATE_LIMIT_PRO_PER_MINUTE", "600")),
+        ),
+    }
+
+
+class InMemoryRateLimitStore:
+    # Full buckets carry no information, so idle ones are dropped every SWEEP_EVERY calls
+    SWEEP_EVERY = 10_000
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._buckets: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        self._calls = 0
+
+    async def consume(self, key: str, policy: RateLimitPolicy) -> Tuple[bool, float]:
+        """Spends one token if available; returns (allowed, tokens left)."""
+        now = self.clock()
+        rate = policy.refill_per_second
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = float(policy.burst)
+                bucket = self._buckets[key] = [tokens, now, policy.burst / rate]
+            else:
+                tokens = min(policy.burst, bucket[0] + (now - bucket[1]) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            bucket[0], bucket[1] = tokens, now
+
+            self._calls += 1
+            if self._calls % self.SWEEP_EVERY == 0:
+                self._sweep(now)
+        return allowed, tokens
+
+    def _sweep(self, now: float) -> None:
+        idle = [key for key, (_, updated, refill_time) in self._buckets.items() if now - updated > refill_time]
+        for key in idle:
+            del self._buckets[key]
+
+
+TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisRateLimitStore:
+    def __init__(self, client, prefix: str = "ratelimit:"):
+        self.prefix = prefix
+        self._script = client.register_script(TOKEN_BUCKET_LUA)
+
+    async def consume(self, key: str, policy: RateLimitPolicy) -> Tuple[bool, float]:
+        allowed, tokens = await self._script(keys=[self.prefix + key], args=[policy.burst, policy.refill_per_second])
+        return bool(allowed), float(tokens)
+
+
+def create_store(url: str = RATE_LIMIT_STORE_URL):
+    if url.startswith("memory://"):
+        return InMemoryRateLimitStore()
+    # Optional dependency: only needed when limits are shared across gateway replicas
+    from redis import asyncio as redis_asyncio
+
+    return RedisRateLimitStore(redis_asyncio.from_url(url))
+
+
+class RateLimiter:
+    def __init__(self, store, policies: Dict[str, RateLimitPolicy], default_plan: str = RATE_LIMIT_DEFAULT_PLAN):
+        self.store = store
+        self.policies = policies
+        self.default_policy = policies[default_plan]
+
+    async def check(self, subject: str, plan: Optional[str]) -> RateLimitDecision:
+        policy = self.policies.get(plan.lower(), self.default_policy) if plan else self.default_policy
+        allowed, tokens = await self.store.consume(subject, policy)
+        rate = policy.refill_per_second
+        return RateLimitDecision(
+            allowed=allowed,
+            limit=policy.burst,
+            remaining=int(tokens),
+            reset_seconds=math.ceil((policy.burst - tokens) / rate),
+            retry_after=0 if allowed else math.ceil((1 - tokens) / rate),
+        )
@@ -0,0 +1,153 @@
+"""
+HTTP clients for inter-service calls (api-gateway -> limits, assistant -> billing).
+
+Clients are cached per service so connections are pooled instead of reopened on every call, and
+each request carries the current X-Request-ID. When in-process calls are enabled (the all-in-one
+app does it, or SERVICE_CALLS_IN_PROCESS=true) requests go straight to the target ASGI app on the
+shared background loop instead of over loopback HTTP.
+"""
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Dict, Iterator, Tuple
+
+import anyio
+import httpx
+
+from .observability import outbound_headers
+from .services import service_portal, start_service
+
+SERVICE_CALLS_IN_PROCESS = os.getenv("SERVICE_CALLS_IN_PROCESS", "false").lower() == "true"
+
+_clients: Dict[Tuple[str, str], httpx.Client] = {}
+_clients_lock = threading.Lock()
+
+
+_END_OF_BODY = object()
+# Sent when the app fails before starting a response, like the 500 a remote service would return
+_ERROR_START = {"type": "http.response.start", "status": 500, "headers": [(b"content-type", b"text/plain; charset=utf-8")]}
+
+
+def _asgi_scope(request: httpx.Request) -> dict:
+    url = request.url
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": request.method,
+        "scheme": url.scheme,
+        "path": url.path,
+        "raw_path": url.raw_path.split(b"?", 1)[0],
+        "query_string": url.query,
+        "root_path": "",
+        "headers": [(key.lower(), value) for key, value in request.headers.raw],
+        "server": (url.host, url.port or (443 if url.scheme == "https" else 80)),
+        "client": ("127.0.0.1", 0),
+        "extensions": {},
+    }
+
+
+async def _run_app(app, scope: dict, body: bytes, started: Future, chunks: queue.Queue, disconnected: anyio.Event):
+    """Runs on the portal loop, handing the response start to `started` and body chunks to `chunks`."""
+    request_sent = False
+
+    async def receive() -> dict:
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: dict) -> None:
+        if message["type"] == "http.response.start" and not started.done():
+            started.set_result(message)
+        elif message["type"] == "http.response.body" and message.get("body"):
+            chunks.put(message["body"])
+
+    try:
+        await app(scope, receive, send)
+    except Exception:
+        # Unhandled app errors become a 500 response; after the start they end the body early
+        if not started.done():
+            started.set_result(_ERROR_START)
+            chunks.put(b"Internal Server Error")
+    finally:
+        if not started.done():
+            started.set_result(_ERROR_START)
+        chunks.put(_END_OF_BODY)
+
+
+class _InProcessBody(httpx.SyncByteStream):
+    def __init__(self, chunks: queue.Queue, disconnected: anyio.Event):
+        self.chunks = chunks
+        self.disconnected = disconnected
+
+    def __iter__(self) -> Iterator[bytes]:
+        while True:
+            chunk = self.chunks.get()
+            if chunk is _END_OF_BODY:
+                return
+            yield chunk
+
+    def close(self) -> None:
+        # Tells a still-streaming app that the caller went away
+        try:
+            service_portal().call(self.disconnected.set)
+        except RuntimeError:
+            pass
+
+
+class InProcessTransport(httpx.BaseTransport):
+    """
+    Sync transport that serves requests with the service's ASGI app in this process. The body is
+    handed over chunk by chunk as the app sends it, so streaming endpoints keep streaming.
+    """
+
+    def __init__(self, service: str):
+        self.service = service
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        app = start_service(self.service)
+        portal = service_portal()
+        started: Future = Future()
+        chunks: queue.Queue = queue.Queue()
+        disconnected = portal.call(anyio.Event)
+        portal.start_task_soon(_run_app, app, _asgi_scope(request), request.read(), started, chunks, disconnected)
+
+        message = started.result()
+        headers = [(key.decode("latin-1"), value.decode("latin-1")) for key, value in message.get("headers", [])]
+        return httpx.Response(
+            message["status"], headers=headers, stream=_InProcessBody(chunks, disconnected), request=request
+        )
+
+
+def _propagate_request_id(request: httpx.Request) -> None:
+    request.headers.update(outbound_headers())
+
+
+def enable_in_process_calls() -> None:
+    global SERVICE_CALLS_IN_PROCESS
+    with _clients_lock:
+        SERVICE_CALLS_IN_PROCESS = True
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+
+def service_client(service: str, base_url: str) -> httpx.Client:
+    key = (service, base_url)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        if key not in _clients:
+            transport = InProcessTransport(service) if SERVICE_CALLS_IN_PROCESS else None
+            _clients[key] = httpx.Client(
+                base_url=base_url,
+                transport=transport,
+                event_hooks={"request": [_propagate_request_id]},
+            )
+        return _clients[key]
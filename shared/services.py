@@ -0,0 +1,113 @@
+"""
+Service registry and in-process loading.
+
+`load_service_module` imports a service's `main` module (api-gateway and auth-service live in
+hyphenated directories, so they are loaded by file path). `start_service` additionally runs the
+app's lifespan startup once per process on a shared background event loop, which is what the
+all-in-one app and the in-process service client use.
+"""
+import importlib
+import importlib.util
+import sys
+import threading
+from pathlib import Path
+from types import ModuleType
+from typing import Callable, Dict, Optional
+
+import anyio
+from anyio.from_thread import BlockingPortal, start_blocking_portal
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# service name -> (importable module, directory to run uvicorn from when not a package)
+SERVICES = {
+    "gateway": ("main", REPO_ROOT / "api-gateway"),
+    "auth": ("main", REPO_ROOT / "auth-service"),
+    "documents": ("documents_service.main", None),
+    "limits": ("limits_service.main", None),
+    "billing": ("billing_service.main", None),
+    "assistant": ("assistant_service.main", None),
+}
+
+ASGIApp = Callable
+
+_lock = threading.Lock()
+_portal: Optional[BlockingPortal] = None
+_portal_context = None
+# service name -> (app, stream that delivers lifespan messages to the app, stream of its replies)
+_started: Dict[str, tuple] = {}
+
+
+def load_service_module(name: str) -> ModuleType:
+    """Imports a service's main module; api-gateway and auth-service are loaded by file path."""
+    module_name, app_dir = SERVICES[name]
+    if app_dir is None:
+        return importlib.import_module(module_name)
+
+    qualified = f"{app_dir.name.replace('-', '_')}_main"
+    if qualified in sys.modules:
+        return sys.modules[qualified]
+    if str(REPO_ROOT) not in sys.path:
+        sys.path.insert(0, str(REPO_ROOT))
+    spec = importlib.util.spec_from_file_location(qualified, app_dir / f"{module_name}.py")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[qualified] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def service_portal() -> BlockingPortal:
+    """Background event loop shared by lifespans and in-process calls, usable from any thread."""
+    global _portal, _portal_context
+    with _lock:
+        if _portal is None:
+            _portal_context = start_blocking_portal()
+            _portal = _portal_context.__enter__()
+        return _portal
+
+
+async def _run_lifespan(app: ASGIApp, *, task_status=anyio.TASK_STATUS_IGNORED) -> None:
+    to_app, app_receive = anyio.create_memory_object_stream(1)
+    app_send, from_app = anyio.create_memory_object_stream(1)
+    scope = {"type": "lifespan", "asgi": {"version": "3.0", "spec_version": "2.0"}, "state": {}}
+
+    async with anyio.create_task_group() as tasks:
+        tasks.start_soon(app, scope, app_receive.receive, app_send.send)
+        await to_app.send({"type": "lifespan.startup"})
+        message = await from_app.receive()
+        if message["type"] != "lifespan.startup.complete":
+            raise RuntimeError(message.get("message") or "lifespan startup failed")
+        task_status.started((to_app, from_app))
+
+
+def start_service(name: str) -> ASGIApp:
+    """Imports the service and runs its startup handlers the first time it is needed."""
+    started = _started.get(name)
+    if started is not None:
+        return started[0]
+
+    portal = service_portal()
+    with _lock:
+        if name not in _started:
+            app = load_service_module(name).app
+            _, (to_app, from_app) = portal.start_task(_run_lifespan, app)
+            _started[name] = (app, to_app, from_app)
+        return _started[name][0]
+
+
+async def _shutdown(to_app, from_app) -> None:
+    await to_app.send({"type": "lifespan.shutdown"})
+    await from_app.receive()
+
+
+def stop_services() -> None:
+    """Runs shutdown handlers of every started service and stops the background loop."""
+    global _portal, _portal_context
+    with _lock:
+        if _portal is None:
+            return
+        for _, to_app, from_app in _started.values():
+            _portal.call(_shutdown, to_app, from_app)
+        _started.clear()
+        _portal_context.__exit__(None, None, None)
+        _portal = _portal_context = None